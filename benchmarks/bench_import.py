@@ -0,0 +1,43 @@
+""" Cold import time of each pycricketpred module.
+
+Every module is imported in a fresh interpreter, so nothing is cached between
+runs. The heavy optional dependencies (sklearn, scipy, matplotlib, altair) should
+only be imported by the functions that need them, never by the module itself.
+
+Usage: python benchmarks/bench_import.py [repeats]
+"""
+import subprocess
+import sys
+
+MODULES = ["pycricketpred.data_wrangling", "pycricketpred.data_cleaning", "pycricketpred.eda",
+           "pycricketpred.modelling", "pycricketpred.scoring", "pycricketpred.player_stats"]
+HEAVY = ["sklearn", "scipy", "matplotlib", "altair"]
+
+SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed, ','.join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+
+def import_time(module):
+    """ Seconds to import a module in a fresh interpreter, and the heavy packages it pulled in """
+    out = subprocess.run([sys.executable, "-c", SCRIPT.format(module=module, heavy=HEAVY)],
+                         capture_output=True, text=True, check=True).stdout.split()
+    return float(out[0]), out[1] if len(out) > 1 else ""
+
+
+def main(repeats=5):
+    baseline = min(import_time("pandas")[0] for _ in range(repeats))
+    print(f"{'pandas (baseline)':>30}: {baseline * 1e3:7.1f} ms")
+    for module in MODULES:
+        runs = [import_time(module) for _ in range(repeats)]
+        best = min(t for t, _ in runs)
+        heavy = runs[0][1] or "-"
+        print(f"{module:>30}: {best * 1e3:7.1f} ms (+{(best - baseline) * 1e3:6.1f} ms), heavy: {heavy}")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,48 @@
+""" Benchmark of the JSON decoders available to parse_cricket_json.
+
+Times decoding alone and the full parse of a sample Cricsheet file with every
+installed decoder (orjson, msgspec, and the standard library json module).
+
+Usage: python benchmarks/bench_json.py [path/to/match.json] [repeats]
+"""
+import io
+import sys
+import timeit
+
+import pandas as pd
+from pycricketpred.data_wrangling import get_json_decoder, parse_cricket_json
+
+
+def available_decoders():
+    decoders = []
+    for name in ["json", "orjson", "msgspec"]:
+        try:
+            get_json_decoder(name)
+        except ImportError:
+            print(f"{name:>8}: not installed")
+            continue
+        decoders.append(name)
+    return decoders
+
+
+def main(path='tests/data/211028.json', repeats=200):
+    with open(path, 'rb') as f:
+        raw = f.read()
+
+    decoders = available_decoders()
+    reference = parse_cricket_json(io.BytesIO(raw), 'bench', json_decoder="json")
+    baseline = None
+    for name in decoders:
+        pd.testing.assert_frame_equal(parse_cricket_json(io.BytesIO(raw), 'bench', json_decoder=name), reference)
+
+        decode = get_json_decoder(name)
+        decode_time = min(timeit.repeat(lambda: decode(raw), number=repeats, repeat=3)) / repeats
+        parse_time = min(timeit.repeat(lambda: parse_cricket_json(io.BytesIO(raw), 'bench', json_decoder=name),
+                                       number=repeats, repeat=3)) / repeats
+        baseline = baseline or parse_time
+        print(f"{name:>8}: decode {decode_time * 1e3:.3f} ms, parse {parse_time * 1e3:.3f} ms/file "
+              f"({baseline / parse_time:.2f}x)")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2], *[int(x) for x in sys.argv[2:3]])
@@ -0,0 +1,73 @@
+""" Microbenchmark for parse_cricket_json.
+
+Compares the columnar parser against the previous row-of-dicts implementation
+on a sample Cricsheet file and checks both produce the same frame.
+
+Usage: python benchmarks/bench_parse.py [path/to/match.json] [repeats]
+"""
+import io
+import json
+import sys
+import timeit
+
+import pandas as pd
+from pycricketpred.data_wrangling import parse_cricket_json
+
+
+def parse_rows(file_content, game_id):
+    """ Previous implementation: one dict per delivery, converted with pd.DataFrame(list_of_dicts) """
+    data = json.load(file_content)
+    player_registry = data['info']['registry']['people']
+    season = data['info']['season']
+    date = data['info']['dates'][0]
+    deliveries_data = []
+    for inning in data['innings']:
+        for over in inning['overs']:
+            for delivery in over['deliveries']:
+                wicket_info = delivery.get('wickets')
+                player_out = wicket_info[0]['player_out'] if wicket_info else ""
+                fielders = [wicket_info[0]['fielders'][0]['name'] if wicket_info and 'fielders' in wicket_info[0] else ""]
+                deliveries_data.append({
+                    "game_id": game_id,
+                    "season": season,
+                    "date": date,
+                    "team": inning['team'],
+                    "over": over['over'],
+                    "batter": delivery['batter'],
+                    "batter_id": player_registry.get(delivery['batter'], "Unknown"),
+                    "bowler": delivery['bowler'],
+                    "bowler_id": player_registry.get(delivery['bowler'], "Unknown"),
+                    "non_striker": delivery['non_striker'],
+                    "non_striker_id": player_registry.get(delivery['non_striker'], "Unknown"),
+                    "wides": delivery.get('extras', {}).get('wides', 0),
+                    "noballs": delivery.get('extras', {}).get('noballs', 0),
+                    "legbyes": delivery.get('extras', {}).get('legbyes', 0),
+                    "byes": delivery.get('extras', {}).get('byes', 0),
+                    "wicket": 1 if wicket_info else 0,
+                    "player_out": player_out,
+                    "player_out_id": player_registry.get(player_out, "Unknown") if player_out else "",
+                    "fielders_name": fielders[0],
+                    "fielders_id": player_registry.get(fielders[0], "Unknown") if fielders[0] else "",
+                    "wicket_type": wicket_info[0]['kind'] if wicket_info else "",
+                    "runs_batter": delivery['runs']['batter'],
+                    "runs_extras": delivery['runs']['extras'],
+                    "runs_total": delivery['runs']['total'],
+                })
+    return pd.DataFrame(deliveries_data)
+
+
+def main(path='tests/data/211028.json', repeats=200):
+    with open(path, 'rb') as f:
+        raw = f.read()
+
+    pd.testing.assert_frame_equal(parse_rows(io.BytesIO(raw), 'bench'),
+                                  parse_cricket_json(io.BytesIO(raw), 'bench'))
+    n_deliveries = len(parse_cricket_json(io.BytesIO(raw), 'bench'))
+
+    for label, func in [("row dicts", parse_rows), ("columnar", parse_cricket_json)]:
+        best = min(timeit.repeat(lambda: func(io.BytesIO(raw), 'bench'), number=repeats, repeat=3)) / repeats
+        print(f"{label:>10}: {best * 1e3:.3f} ms/file, {best / n_deliveries * 1e6:.2f} us/delivery")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2], *[int(x) for x in sys.argv[2:3]])
@@ -0,0 +1,67 @@
+""" Per-call latency of single-delivery wicket predictions.
+
+Compares Pipeline.predict_proba on a one-row DataFrame with the compiled
+NumPy predictor, for a dict, a NumPy row and a batch.
+
+Without a path, the combined parquet file is built from tests/data/test_zips.zip
+in a temporary directory.
+
+Usage: python benchmarks/bench_predict.py [path/to/cricket_main.parquet] [repeats]
+"""
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+from pycricketpred.data_wrangling import (process_cricket_jsons, determine_majority_dtypes, apply_dtypes_and_write,
+                                          parquet_data_files)
+from pycricketpred.modelling import MODEL_FEATS, build_final_model, preprocessing, split_train_test, transformer
+from pycricketpred.scoring import compile_predictor
+
+
+def per_call(func, repeats):
+    return min(timeit.repeat(func, number=repeats, repeat=3)) / repeats
+
+
+def build_sample(folder, zip_path='tests/data/test_zips.zip'):
+    # same steps as the cricket_main fixture of tests/conftest.py
+    games = os.path.join(folder, "games")
+    process_cricket_jsons(zip_path, games)
+    files = [os.path.relpath(f, games) for f in parquet_data_files(games)]
+    path = os.path.join(folder, "cricket_main.parquet")
+    apply_dtypes_and_write(files, games, determine_majority_dtypes(files, games), path)
+    return path
+
+
+def main(path=None, repeats=2000):
+    if path is None:
+        with tempfile.TemporaryDirectory() as folder:
+            return main(build_sample(folder), repeats)
+
+    X_train, X_test, y_train, y_test = split_train_test(path)
+    ohe, scaler = preprocessing()
+    final_pipe = build_final_model(transformer(ohe, scaler), X_train, y_train)
+    predictor = compile_predictor(final_pipe)
+
+    assert np.allclose(predictor.predict_proba(X_test), final_pipe.predict_proba(X_test))
+
+    frame = X_test.iloc[[0]]
+    row = frame[MODEL_FEATS].iloc[0].to_dict()
+    array_row = frame[predictor.features].to_numpy()[0]
+    batch = X_test[MODEL_FEATS]
+
+    pipeline_time = per_call(lambda: final_pipe.predict_proba(frame), max(repeats // 10, 1))
+    print(f"   pipeline, 1 row: {pipeline_time * 1e6:9.1f} us/call")
+    for label, func in [("compiled, dict", lambda: predictor.predict_one(row)),
+                        ("compiled, numpy row", lambda: predictor.predict_proba(array_row))]:
+        t = per_call(func, repeats)
+        print(f"{label:>19}: {t * 1e6:9.1f} us/call ({pipeline_time / t:.0f}x)")
+
+    pipeline_batch = per_call(lambda: final_pipe.predict_proba(X_test), 20)
+    compiled_batch = per_call(lambda: predictor.predict_proba(batch), 20)
+    print(f"batch of {len(batch)}: pipeline {pipeline_batch * 1e3:.2f} ms, compiled {compiled_batch * 1e3:.2f} ms")
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:2], *[int(x) for x in sys.argv[2:3]])
@@ -0,0 +1,272 @@
+import hashlib
+import json
+import os
+import time
+import zipfile
+
+import click
+import numpy as np
+import pandas as pd
+from pycricketpred.data_wrangling import (process_cricket_jsons, determine_majority_dtypes, apply_dtypes_and_write,
+                                          parquet_data_files, data_fingerprint)
+from pycricketpred.modelling import (MODEL_FEATS, read_model_data, split_train_test, preprocessing, transformer,
+                                     build_final_model, evaluate_predictions)
+from pycricketpred.scoring import save_model, load_model
+
+# stage fingerprints of the last successful run and cached parquet file digests, kept in the working directory
+STATE_NAME = "_pipeline.json"
+
+# key of the parquet file digests in the state, see data_fingerprint
+DIGESTS_KEY = "file_digests"
+
+# stages of the pipeline in dependency order
+STAGE_NAMES = ["ingest", "dtypes", "concatenate", "split", "train", "evaluate"]
+
+# columns the split stage keeps: the model features, the season for per-season metrics, and the target
+SPLIT_COLUMNS = MODEL_FEATS + ['season', 'wicket']
+
+
+def pipeline_paths(workdir):
+    """ Paths of the files the pipeline stages write, inside the working directory
+
+    Parameters
+    ----------
+    workdir: str
+        Working directory of the pipeline
+
+    Returns
+    ----------
+    dict
+        Output path of every stage, keyed by a short name
+
+    Example
+    ----------
+    >>> pipeline_paths('data/pipeline')['model']
+    'data/pipeline/model.npz'
+    """
+    return {
+        "games": os.path.join(workdir, "games"),
+        "dtypes": os.path.join(workdir, "dtypes.json"),
+        "main": os.path.join(workdir, "cricket_main.parquet"),
+        "train": os.path.join(workdir, "train.parquet"),
+        "test": os.path.join(workdir, "test.parquet"),
+        "model": os.path.join(workdir, "model.npz"),
+        "metrics": os.path.join(workdir, "metrics.json"),
+    }
+
+
+def path_fingerprint(path, cache=None):
+    """ Fingerprint the content of a stage input
+
+    Zip archives are fingerprinted from the name, CRC-32 and size of their members, parquet files
+    and directories from their paths and bytes (see data_fingerprint), and any other file from its bytes.
+
+    Parameters
+    ----------
+    path: str
+        File or parquet directory to fingerprint
+
+    cache: dict, optional
+        Parquet file digests passed on to data_fingerprint, so unchanged files are not read again
+
+    Returns
+    ----------
+    str
+        Hex SHA-256 digest, or None if the path does not exist
+
+    Example
+    ----------
+    >>> path_fingerprint('data/t20s_json.zip')
+    """
+    if not os.path.exists(path):
+        return None
+    if os.path.isdir(path) or path.endswith('.parquet'):
+        return data_fingerprint(path, cache)
+
+    digest = hashlib.sha256()
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path, 'r') as z:
+            for info in sorted(z.infolist(), key=lambda info: info.filename):
+                digest.update(f"{info.filename}:{info.CRC}:{info.file_size}\n".encode())
+    else:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _ingest(zip_file_path, paths, n_workers):
+    process_cricket_jsons(zip_file_path, paths["games"], n_workers=n_workers, incremental=True)
+
+
+def _dtypes(paths):
+    files = [os.path.relpath(f, paths["games"]) for f in parquet_data_files(paths["games"])]
+    majority = determine_majority_dtypes(files, paths["games"], metadata_only=True)
+    with open(paths["dtypes"], 'w') as f:
+        json.dump(majority, f, indent=2, sort_keys=True)
+
+
+def _concatenate(paths):
+    with open(paths["dtypes"]) as f:
+        majority = json.load(f)
+    files = [os.path.relpath(f, paths["games"]) for f in parquet_data_files(paths["games"])]
+    apply_dtypes_and_write(files, paths["games"], majority, paths["main"])
+
+
+def _split(paths):
+    X_train, X_test, y_train, y_test = split_train_test(paths["main"], columns=SPLIT_COLUMNS)
+    pd.concat([X_train, y_train], axis=1).to_parquet(paths["train"], index=False)
+    pd.concat([X_test, y_test], axis=1).to_parquet(paths["test"], index=False)
+
+
+def _train(paths):
+    train = read_model_data(paths["train"]).dropna()
+    ohe, scaler = preprocessing()
+    ct = transformer(ohe, scaler, drop_feats=['season'])
+    final_pipe = build_final_model(ct, train.drop(columns=['wicket']), train['wicket'])
+    save_model(final_pipe, paths["model"], training_data=paths["train"])
+
+
+def _evaluate(paths):
+    test = read_model_data(paths["test"])
+    results = evaluate_predictions(load_model(paths["model"]), test.drop(columns=['wicket']), test['wicket'])
+    summary = {
+        "accuracy": results["accuracy"],
+        "roc_auc": None if np.isnan(results["roc_auc"]) else float(results["roc_auc"]),
+        "log_loss": float(results["log_loss"]),
+        "confusion_matrix": results["confusion_matrix"].tolist(),
+        "calibration": results["calibration"].reset_index(names="bin").to_dict(orient="records"),
+    }
+    with open(paths["metrics"], 'w') as f:
+        json.dump(summary, f, indent=2)
+
+
+def pipeline_stages(zip_file_path, workdir, n_workers=1):
+    """ Describe the pipeline as a DAG of stages
+
+    Parameters
+    ----------
+    zip_file_path: str
+        Zipped archive of Cricsheet JSON files
+
+    workdir: str
+        Working directory the stages write their outputs to
+
+    n_workers: int
+        Number of worker processes of the ingestion stage
+
+    Returns
+    ----------
+    list(tuple)
+        (name, input paths, output paths, callable) of every stage, in dependency order.
+        A stage depends on the stages whose outputs are among its inputs.
+
+    Example
+    ----------
+    >>> [name for name, *_ in pipeline_stages('data/t20s_json.zip', 'data/pipeline')]
+    ['ingest', 'dtypes', 'concatenate', 'split', 'train', 'evaluate']
+    """
+    paths = pipeline_paths(workdir)
+    return [
+        ("ingest", [zip_file_path], [paths["games"]], lambda: _ingest(zip_file_path, paths, n_workers)),
+        ("dtypes", [paths["games"]], [paths["dtypes"]], lambda: _dtypes(paths)),
+        ("concatenate", [paths["games"], paths["dtypes"]], [paths["main"]], lambda: _concatenate(paths)),
+        ("split", [paths["main"]], [paths["train"], paths["test"]], lambda: _split(paths)),
+        ("train", [paths["train"]], [paths["model"]], lambda: _train(paths)),
+        ("evaluate", [paths["model"], paths["test"]], [paths["metrics"]], lambda: _evaluate(paths)),
+    ]
+
+
+def run_pipeline(zip_file_path, workdir, n_workers=1, force=False, until=None, echo=print):
+    """ Run the ingestion, dtype harmonization, split, training and evaluation stages, skipping unchanged ones
+
+    Every stage fingerprints its inputs. A stage is skipped when the fingerprint matches the one
+    recorded in workdir/_pipeline.json by its last successful run and all its outputs exist, so a
+    re-run after adding a few games to the archive only redoes the affected stages, and ingestion
+    only converts the new games. The digests of parquet files are kept in the same file, and only
+    files whose size or modification time changed are read again to fingerprint them.
+
+    Parameters
+    ----------
+    zip_file_path: str
+        Zipped archive of Cricsheet JSON files
+
+    workdir: str
+        Working directory the stages write their outputs to
+
+    n_workers: int
+        Number of worker processes of the ingestion stage
+
+    force: bool
+        Run every stage even if its inputs are unchanged
+
+    until: str, optional
+        Name of the last stage to run, all stages by default
+
+    echo: callable
+        Called with one progress line per stage
+
+    Returns
+    ----------
+    dict
+        "ran" or "skipped" for every stage that was reached
+
+    Example
+    ----------
+    >>> run_pipeline('data/t20s_json.zip', 'data/pipeline', n_workers=4)
+    {'ingest': 'ran', 'dtypes': 'ran', 'concatenate': 'ran', 'split': 'ran', 'train': 'ran', 'evaluate': 'ran'}
+    """
+    if until is not None and until not in STAGE_NAMES:
+        raise ValueError(f"until must be one of {STAGE_NAMES}")
+    if not os.path.exists(zip_file_path):
+        raise FileNotFoundError(f"No such archive: {zip_file_path}")
+
+    os.makedirs(workdir, exist_ok=True)
+    state_path = os.path.join(workdir, STATE_NAME)
+    state = {}
+    if os.path.exists(state_path):
+        with open(state_path) as f:
+            state = json.load(f)
+    # forget the digests of files that are gone, such as games removed from the archive
+    cache = {path: entry for path, entry in state.get(DIGESTS_KEY, {}).items() if os.path.exists(path)}
+    state[DIGESTS_KEY] = cache
+
+    status = {}
+    for name, inputs, outputs, run in pipeline_stages(zip_file_path, workdir, n_workers):
+        digest = hashlib.sha256(name.encode())
+        for path in inputs:
+            digest.update(f"{os.path.basename(path)}:{path_fingerprint(path, cache)}\n".encode())
+        fingerprint = digest.hexdigest()
+
+        if not force and state.get(name) == fingerprint and all(os.path.exists(path) for path in outputs):
+            status[name] = "skipped"
+            echo(f"{name}: unchanged, skipped")
+        else:
+            start = time.perf_counter()
+            run()
+            status[name] = "ran"
+            echo(f"{name}: done in {time.perf_counter() - start:.2f}s")
+            # record the stage as soon as it succeeds, so a failure later on keeps its work
+            state[name] = fingerprint
+            with open(state_path, 'w') as f:
+                json.dump(state, f, indent=2)
+
+        if name == until:
+            break
+    return status
+
+
+@click.group()
+def main():
+    """ Predict wickets from Cricsheet ball-by-ball data """
+
+
+@main.command()
+@click.argument("zip_file_path", type=click.Path(exists=True, dir_okay=False))
+@click.argument("workdir", type=click.Path(file_okay=False))
+@click.option("--n-workers", default=1, show_default=True, help="Worker processes for ingestion.")
+@click.option("--force", is_flag=True, help="Run every stage even if its inputs are unchanged.")
+@click.option("--until", type=click.Choice(STAGE_NAMES), help="Last stage to run.")
+def run(zip_file_path, workdir, n_workers, force, until):
+    """ Run the pipeline on ZIP_FILE_PATH, writing every stage's output to WORKDIR """
+    run_pipeline(zip_file_path, workdir, n_workers=n_workers, force=force, until=until, echo=click.echo)
@@ -1,6 +1,5 @@
 import pandas as pd
 import os
-from sklearn.model_selection import train_test_split
 
 
 def separate_columns(dataframe):
@@ -99,6 +98,8 @@ def split_and_save_data(X, y, train_size=0.7, save_table_path="."):
     if not isinstance(save_table_path, str):
         raise TypeError("save_table_path must be a string")
 
+    from sklearn.model_selection import train_test_split
+
     # Split the data into training and testing sets
     X_train, X_test, y_train, y_test = train_test_split(X, y, train_size=train_size, shuffle=False,)
     
@@ -1,21 +1,132 @@
+import hashlib
 import os
+import numpy as np
 import pandas as pd
 import json  # Make sure to import json
-import pyarrow
+import math
+import pyarrow as pa
+import pyarrow.parquet as pq
 import zipfile
 from collections import defaultdict
+from pandas.api.types import union_categoricals
 
-def parse_cricket_json(file_content, game_id):
+# faster JSON decoders are used when they are installed, see get_json_decoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# columns produced by parse_cricket_json, in output order
+DELIVERY_COLUMNS = ["game_id", "season", "date", "team", "over", "batter", "batter_id", "bowler", "bowler_id",
+                    "non_striker", "non_striker_id", "wides", "noballs", "legbyes", "byes", "wicket",
+                    "player_out", "player_out_id", "fielders_name", "fielders_id", "wicket_type",
+                    "runs_batter", "runs_extras", "runs_total"]
+
+# unified schema of the partitioned dataset written by process_cricket_jsons(output_format="dataset")
+DELIVERY_SCHEMA = pa.schema(
+    [(col, pa.int64() if col in ("over", "wides", "noballs", "legbyes", "byes", "wicket",
+                                 "runs_batter", "runs_extras", "runs_total") else pa.string())
+     for col in DELIVERY_COLUMNS]
+    + [("team_over", pa.string()), ("over_ball", pa.int64()), ("inning", pa.int64()),
+       ("runs_cumulative", pa.int64()), ("powerplay", pa.int64())]
+)
+
+# string columns with few distinct values that can be stored as pandas categoricals / Arrow dictionaries
+CATEGORICAL_COLUMNS = ["game_id", "season", "date", "team", "team_over", "batter", "batter_id", "bowler", "bowler_id",
+                       "non_striker", "non_striker_id", "player_out", "player_out_id", "fielders_name",
+                       "fielders_id", "wicket_type"]
+
+# (name column, cricsheet id column) of every player role recorded on a delivery, keyed by role
+PLAYER_COLUMNS = {"batter": ("batter", "batter_id"), "bowler": ("bowler", "bowler_id"),
+                  "non_striker": ("non_striker", "non_striker_id"), "player_out": ("player_out", "player_out_id"),
+                  "fielders": ("fielders_name", "fielders_id")}
+
+# name of the player registry written next to the data, see process_cricket_jsons(player_registry=True)
+REGISTRY_NAME = "_players.parquet"
+
+# name of the file in the output folder recording the archive members that have been converted
+MANIFEST_NAME = "_manifest.json"
+
+# version of the converted game files, recorded in the manifest. Bump it whenever the output of
+# parse_cricket_json changes, so incremental runs reconvert the games converted by an older version
+PARSER_VERSION = 2
+
+# upper bound on the number of archive members handled by one shard
+MAX_SHARD_SIZE = 64
+
+# number of shards per worker submitted to the process pool at a time, so converted tables
+# waiting to be written are bounded by this many shards per worker rather than the whole archive
+MAX_PENDING_SHARDS = 2
+
+def get_json_decoder(name=None):
+    """ Get a function that decodes the JSON content of a file
+    
+    Parameters
+    ----------
+    name : str, optional
+        One of "orjson", "msgspec" or "json". By default orjson is used when it is installed, with
+        the standard library json module as the fallback. msgspec decodes into plain objects here,
+        which is no faster than json, so it is only used when requested.
+
+    Returns
+    -------
+    callable
+        Function decoding bytes (or str) into Python objects
+
+    Raises
+    ----------
+    ValueError: If name is not a known decoder.
+
+    ImportError: If the requested library is not installed.
+
+    Examples
+    --------
+    >>> decode = get_json_decoder()
+    >>> with open('232031.json', 'rb') as f:
+    >>>     decode(f.read())
+
+    """
+    if name is None:
+        name = "orjson" if orjson is not None else "json"
+
+    if name == "orjson":
+        if orjson is None:
+            raise ImportError("orjson is not installed")
+        return orjson.loads
+    elif name == "msgspec":
+        if msgspec is None:
+            raise ImportError("msgspec is not installed")
+        return msgspec.json.decode
+    elif name == "json":
+        return json.loads
+    raise ValueError("name must be 'orjson', 'msgspec' or 'json'")
+
+
+def parse_cricket_json(file_content, game_id, categorical=False, json_decoder=None):
     """ Parse a json file into a pandas dataframe given the json content and game id
     
     Parameters
     ----------
-    file_content : io.TextIOWrapper
-        Content of the JSON file we are attempting to read.
+    file_content : file-like object
+        Content of the JSON file we are attempting to read, in binary (e.g. from zipfile.ZipFile.open)
+        or text mode.
     
     game_id: str
         ID of the game whose data we are parsing 
 
+    categorical: bool
+        Return the string columns listed in CATEGORICAL_COLUMNS as pandas categoricals
+
+    json_decoder: str, optional
+        Name of the JSON library to decode the file with, see get_json_decoder.
+        orjson is used by default when it is installed, json otherwise.
+
     Returns
     -------
     pd.DataFrame
@@ -29,64 +140,153 @@ def parse_cricket_json(file_content, game_id):
     >>>     parse_cricket_json(file_content, '232031')
 
     """
-    data = json.load(file_content)
+    # decode the raw content directly, without wrapping binary files in a text reader
+    data = get_json_decoder(json_decoder)(file_content.read())
     innings = data['innings']
     player_registry = data['info']['registry']['people']
     season = data['info']['season']
-    deliveries_data = []
+    # first day of the match, as an ISO date string
+    date = data['info']['dates'][0]
+    lookup = player_registry.get
+
+    # one list per output column, filled in a single pass over the deliveries
+    columns = {col: [] for col in DELIVERY_COLUMNS if col not in ('game_id', 'season', 'date')}
+    team = columns['team'].append
+    over_col = columns['over'].append
+    batter = columns['batter'].append
+    batter_id = columns['batter_id'].append
+    bowler = columns['bowler'].append
+    bowler_id = columns['bowler_id'].append
+    non_striker = columns['non_striker'].append
+    non_striker_id = columns['non_striker_id'].append
+    wides = columns['wides'].append
+    noballs = columns['noballs'].append
+    legbyes = columns['legbyes'].append
+    byes = columns['byes'].append
+    wicket = columns['wicket'].append
+    player_out = columns['player_out'].append
+    player_out_id = columns['player_out_id'].append
+    fielders_name = columns['fielders_name'].append
+    fielders_id = columns['fielders_id'].append
+    wicket_type = columns['wicket_type'].append
+    runs_batter = columns['runs_batter'].append
+    runs_extras = columns['runs_extras'].append
+    runs_total = columns['runs_total'].append
 
     for inning in innings:
         team_name = inning['team']
         for over in inning['overs']:
             over_number = over['over']
             for delivery in over['deliveries']:
-                batter_id = player_registry.get(delivery['batter'], "Unknown")
-                bowler_id = player_registry.get(delivery['bowler'], "Unknown")
-                non_striker_id = player_registry.get(delivery['non_striker'], "Unknown")
-                wides = delivery.get('extras', {}).get('wides', 0)
-                noballs = delivery.get('extras', {}).get('noballs', 0)
-                legbyes = delivery.get('extras', {}).get('legbyes', 0)
-                byes = delivery.get('extras', {}).get('byes', 0)
+                team(team_name)
+                over_col(over_number)
+
+                name = delivery['batter']
+                batter(name)
+                batter_id(lookup(name, "Unknown"))
+                name = delivery['bowler']
+                bowler(name)
+                bowler_id(lookup(name, "Unknown"))
+                name = delivery['non_striker']
+                non_striker(name)
+                non_striker_id(lookup(name, "Unknown"))
+
+                extras = delivery.get('extras')
+                if extras:
+                    wides(extras.get('wides', 0))
+                    noballs(extras.get('noballs', 0))
+                    legbyes(extras.get('legbyes', 0))
+                    byes(extras.get('byes', 0))
+                else:
+                    wides(0)
+                    noballs(0)
+                    legbyes(0)
+                    byes(0)
+
                 wicket_info = delivery.get('wickets')
-                wicket = 1 if wicket_info else 0
-                player_out = wicket_info[0]['player_out'] if wicket_info else ""
-                player_out_id = player_registry.get(player_out, "Unknown") if player_out else ""
-                fielders = [wicket_info[0]['fielders'][0]['name'] if wicket_info and 'fielders' in wicket_info[0] else ""]
-                fielders_id = [player_registry.get(fielders[0], "Unknown") if fielders[0] else ""]
-                kind = [wicket_info[0]['kind'] if wicket_info else ""]
-
-                delivery_info = {
-                    "game_id": game_id,
-                    "season": season,
-                    "team": team_name,
-                    "over": over_number,
-                    "batter": delivery['batter'],
-                    "batter_id": batter_id,
-                    "bowler": delivery['bowler'],
-                    "bowler_id": bowler_id,
-                    "non_striker": delivery['non_striker'],
-                    "non_striker_id": non_striker_id,
-                    "wides": wides,
-                    "noballs": noballs,
-                    "legbyes": legbyes,
-                    "byes": byes,
-                    "wicket": wicket,
-                    "player_out": player_out,
-                    "player_out_id": player_out_id,
-                    "fielders_name": fielders[0],
-                    "fielders_id": fielders_id[0],
-                    "wicket_type": kind[0],
-                    "runs_batter": delivery['runs']['batter'],
-                    "runs_extras": delivery['runs']['extras'],
-                    "runs_total": delivery['runs']['total']
-                }
-                deliveries_data.append(delivery_info)
-    return pd.DataFrame(deliveries_data)
-
-
-
-
-def add_columns(df):
+                if wicket_info:
+                    first_wicket = wicket_info[0]
+                    name = first_wicket['player_out']
+                    wicket(1)
+                    player_out(name)
+                    player_out_id(lookup(name, "Unknown") if name else "")
+                    name = first_wicket['fielders'][0]['name'] if 'fielders' in first_wicket else ""
+                    fielders_name(name)
+                    fielders_id(lookup(name, "Unknown") if name else "")
+                    wicket_type(first_wicket['kind'])
+                else:
+                    wicket(0)
+                    player_out("")
+                    player_out_id("")
+                    fielders_name("")
+                    fielders_id("")
+                    wicket_type("")
+
+                runs = delivery['runs']
+                runs_batter(runs['batter'])
+                runs_extras(runs['extras'])
+                runs_total(runs['total'])
+
+    n_deliveries = len(columns['team'])
+    # matches without any deliveries (e.g. abandoned) produce an empty frame, as before
+    if n_deliveries == 0:
+        return pd.DataFrame()
+
+    columns['game_id'] = [game_id] * n_deliveries
+    columns['season'] = [season] * n_deliveries
+    columns['date'] = [date] * n_deliveries
+    df = pd.DataFrame({col: columns[col] for col in DELIVERY_COLUMNS})
+    if categorical:
+        df = to_categorical(df)
+    return df
+
+
+def to_categorical(df, columns=CATEGORICAL_COLUMNS):
+    """ Convert string columns of a dataframe to pandas categoricals
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe of deliveries
+
+    columns : list(str)
+        Columns to convert, the ones missing from df are ignored
+
+    Returns
+    -------
+    pd.DataFrame
+        Returns the dataframe with the columns converted. 'season' is converted to strings first,
+        so seasons like 2005 and '2016/17' share one set of categories.
+
+    Examples
+    --------
+    >>> to_categorical(df_game_232031)
+
+    """
+    for col in columns:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            values = df[col].astype(str) if col == 'season' else df[col]
+            df[col] = values.astype('category')
+    return df
+
+
+def _unify_categories(dfs):
+    """ Give every categorical column the union of its categories across the dataframes, in place,
+    so pd.concat keeps the categorical dtype instead of falling back to object """
+    columns = {col for df in dfs for col, dtype in df.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)}
+    for col in columns:
+        parts = [df[col] for df in dfs if col in df.columns]
+        if not all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            continue
+        categories = union_categoricals(parts).categories
+        for df in dfs:
+            if col in df.columns:
+                df[col] = df[col].cat.set_categories(categories)
+
+
+
+
+def add_columns(df, by_game=False):
     """ Take in a dataframe and add extra columns needed for the analysis
     Extra columns added are: 
     team_over (which over is being played which team: str),
@@ -100,6 +300,10 @@ def add_columns(df):
     df : pd.DataFrame
         Dataframe that has been created from a JSON file 
 
+    by_game : bool
+        Compute the columns separately for every game_id, so a frame concatenated from
+        many games can be processed in one call. By default the frame is treated as one game.
+
     Returns
     -------
     df: pd.DataFrame
@@ -111,35 +315,201 @@ def add_columns(df):
     >>> with open('232031.json') as file_content:
     >>>     df_game_232031 = parse_cricket_json(file_content, '232031')
     >>> add_columns(df_game_232031)
+    >>> add_columns(pd.concat([df_game_232031, df_game_232032]), by_game=True)
 
     """
     if 'team' not in df.columns or 'over' not in df.columns or 'runs_total' not in df.columns:
         raise KeyError("Columns are missing")
+    elif by_game and 'game_id' not in df.columns:
+        raise KeyError("Columns are missing")
     else:
 
+        # integer codes for the teams, numbered in order of appearance
+        team_codes, _ = pd.factorize(df['team'])
+        overs = df['over'].to_numpy()
+
+        if by_game:
+            game_codes, _ = pd.factorize(df['game_id'])
+            first_team = pd.Series(team_codes).groupby(game_codes).transform('first').to_numpy()
+            keys = [game_codes]
+        else:
+            first_team = 0
+            keys = []
+
         # add the over for each team specifically
-        df['team_over'] = df['team'] + "_" + df['over'].astype('str')
+        if isinstance(df['team'].dtype, pd.CategoricalDtype):
+            df['team_over'] = (df['team'].astype(str) + "_" + df['over'].astype('str')).astype('category')
+        else:
+            df['team_over'] = df['team'] + "_" + df['over'].astype('str')
 
         # indicate which ball it is in the over
-        df['over_ball'] = df.groupby('team_over').cumcount() + 1
-        
-        # list the teams in specific game
-        teams = df['team'].unique() 
+        df['over_ball'] = (df.groupby(keys + [team_codes, overs], sort=False).cumcount() + 1).astype('int64')
 
-        # create inning column
-        df['inning'] = [1 if x == teams[0] else 2 for x in df['team']]
-        df['inning'] = df['inning'].astype(int)
+        # create inning column, the team batting first in a game is inning 1
+        df['inning'] = np.where(team_codes == first_team, 1, 2).astype('int64')
 
         # calculate runs so far in innings
-        df['runs_cumulative'] = df.groupby('inning')['runs_total'].cumsum()
+        df['runs_cumulative'] = df.groupby(keys + [df['inning'].to_numpy()], sort=False)['runs_total'].cumsum()
 
         # check if it is powerplay 
-        df['powerplay'] = [1 if x <= 5 else 0 for x in df['over']]
+        df['powerplay'] = (df['over'] <= 5).astype('int64')
         
     
     return df
 
-def process_cricket_jsons(zip_file_path, output_folder):
+def _game_id_from_member(filename):
+    """ Extract the game id from a zip member name, assuming filename format is 'folder/game_01.json' """
+    return filename.split('/')[-1].split('.')[0]
+
+
+def delivery_schema(categorical=False):
+    """ Unified schema of the dataset written by process_cricket_jsons(output_format="dataset")
+
+    Parameters
+    ----------
+    categorical : bool
+        Use dictionary-encoded string types for the columns listed in CATEGORICAL_COLUMNS
+
+    Returns
+    -------
+    pyarrow.Schema
+        DELIVERY_SCHEMA, or its dictionary-encoded variant
+
+    Examples
+    --------
+    >>> delivery_schema(categorical=True)
+
+    """
+    if not categorical:
+        return DELIVERY_SCHEMA
+    return pa.schema([(field.name, pa.dictionary(pa.int32(), pa.string())) if field.name in CATEGORICAL_COLUMNS
+                      else field for field in DELIVERY_SCHEMA])
+
+
+def _game_table(df, schema=DELIVERY_SCHEMA):
+    """ Convert a game dataframe from add_columns into an Arrow table with the unified delivery schema """
+    # seasons are ints for some games ('2005') and strings for others ('2016/17')
+    if not isinstance(df['season'].dtype, pd.CategoricalDtype):
+        df = df.assign(season=df['season'].astype(str))
+    return pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+
+
+def _convert_members(zip_file_path, members, output_folder, output_format="files", on_processed=None,
+                     categorical=False, collect_players=False):
+    """ Parse a shard of JSON members of a zipped archive
+    
+    Parameters
+    ----------
+    zip_file_path : str
+        Filepath of zipped archive containing JSON files.
+
+    members : list(str)
+        Names of the JSON members of the archive to convert.
+    
+    output_folder: str
+        File path of output folder to store the transformed parquet files
+
+    output_format: str
+        "files" writes one parquet file per game to output_folder,
+        "dataset" returns the games as Arrow tables for the dataset writer instead
+
+    on_processed: callable, optional
+        Called with the member name after each successfully converted member
+
+    categorical: bool
+        Store the CATEGORICAL_COLUMNS as categoricals / dictionary-encoded columns
+
+    collect_players: bool
+        Collect the (player_id, name) pairs of every converted game
+
+    Returns
+    -------
+    processed: list(str)
+        Members that were converted successfully
+
+    errors: list(tuple)
+        (member, error message) pairs for the members that could not be converted
+
+    tables: list(pyarrow.Table)
+        Converted games when output_format is "dataset", otherwise empty
+
+    players: pd.DataFrame
+        Unique player_id, name and member triples of the converted games when collect_players is True,
+        otherwise None
+    """
+    processed = []
+    errors = []
+    tables = []
+    players = []
+
+    # each worker opens its own handle, zipfile objects can't be shared across processes
+    with zipfile.ZipFile(zip_file_path, 'r') as z:
+        for filename in members:
+            game_id = _game_id_from_member(filename)
+
+            try:
+                with z.open(filename) as file_content:
+                    # Pass the file-like object and game_id to the parsing function
+                    df = parse_cricket_json(file_content, game_id, categorical=categorical)
+                    df = add_columns(df)
+                    if collect_players:
+                        # tag the players with their member, so the canonical names don't depend on shard order
+                        players.append(game_players(df).assign(member=filename))
+
+                    if output_format == "dataset":
+                        tables.append(_game_table(df, delivery_schema(categorical)))
+                    else:
+                        output_file_name = game_id + ".parquet"
+                        output_file_path = os.path.join(output_folder, output_file_name)
+
+                        # Save the DataFrame as a Parquet file
+                        df.to_parquet(output_file_path, index=False)
+
+            except Exception as e:
+                errors.append((filename, str(e)))
+                continue
+
+            processed.append(filename)
+            if on_processed is not None:
+                on_processed(filename)
+
+    if collect_players:
+        players = pd.concat(players, ignore_index=True).drop_duplicates() if players else _empty_players()
+    else:
+        players = None
+    return processed, errors, tables, players
+
+
+def _shard_members(members, n_workers):
+    """ Split archive members into round-robin shards, several per worker and at most MAX_SHARD_SIZE each """
+    n_shards = min(len(members), max(n_workers * 4, math.ceil(len(members) / MAX_SHARD_SIZE)))
+    return [members[i::n_shards] for i in range(n_shards)]
+
+
+def _read_manifest(manifest_path):
+    """ Read the manifest of converted archive members, an empty manifest if there is none yet """
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+
+def _write_manifest(manifest, manifest_path):
+    """ Write the manifest atomically so an interrupted run never leaves a truncated file behind """
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def _member_fingerprint(info):
+    """ Identify the content of a zip member by its game id, CRC-32 and uncompressed size, and the parser version """
+    return {"game_id": _game_id_from_member(info.filename), "crc": info.CRC, "size": info.file_size,
+            "version": PARSER_VERSION}
+
+
+def process_cricket_jsons(zip_file_path, output_folder, n_workers=1, output_format="files",
+                          row_group_size=131072, incremental=False, categorical=False, player_registry=False):
     """ Takes in a zipped archive with JSON files, transforms those files into a dataframe and creates a .parquet file
     
     Parameters
@@ -150,6 +520,33 @@ def process_cricket_jsons(zip_file_path, output_folder):
     output_folder: str
         File path of output folder to store the transformed parquet files
 
+    n_workers: int
+        Number of worker processes to convert the files with. Each worker opens the archive itself
+        and converts a shard of its members. The default of 1 converts the files in this process.
+
+    output_format: str
+        "files" (default) writes one <game_id>.parquet file per game.
+        "dataset" streams all games into a single pyarrow dataset with the unified DELIVERY_SCHEMA,
+        hive-partitioned by season (output_folder/season=2005/part-0.parquet)
+
+    row_group_size: int
+        Number of rows per parquet row group when output_format is "dataset"
+
+    incremental: bool
+        Only convert members that are new or changed since the last run, or were converted with an
+        older PARSER_VERSION, leaving the other parquet files alone, and delete the parquet files of
+        members no longer in the archive. Every "files" run records the game id, CRC-32, size and
+        parser version of the converted members in output_folder/_manifest.json.
+        Only supported for output_format "files".
+
+    categorical: bool
+        Write the CATEGORICAL_COLUMNS dictionary-encoded, so they are read back as pandas categoricals
+
+    player_registry: bool
+        Add every player seen in the converted games to the global player registry in
+        output_folder/_players.parquet, see update_player_registry, and store the integer keys of
+        the registry on the converted deliveries as <role>_key columns, see encode_player_keys
+
     Returns
     -------
     None
@@ -157,42 +554,329 @@ def process_cricket_jsons(zip_file_path, output_folder):
     Examples
     --------
     >>> process_cricket_jsons('data/t20s_json.zip', 'data/t20s_parquet')
+    >>> process_cricket_jsons('data/t20s_json.zip', 'data/t20s_parquet', n_workers=8)
+    >>> process_cricket_jsons('data/t20s_json.zip', 'data/t20s_dataset', output_format="dataset")
+    >>> process_cricket_jsons('data/t20s_json.zip', 'data/t20s_parquet', incremental=True)
+    >>> process_cricket_jsons('data/t20s_json.zip', 'data/t20s_parquet', player_registry=True)
 
     """
+    if type(n_workers) != int or n_workers < 1:
+        raise ValueError("n_workers must be a positive integer")
+
+    if output_format not in ("files", "dataset"):
+        raise ValueError("output_format must be 'files' or 'dataset'")
+
+    if incremental and output_format != "files":
+        raise ValueError("incremental conversion is only supported for output_format 'files'")
+
     # Ensure the output folder exists
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
     with zipfile.ZipFile(zip_file_path, 'r') as z:
-        json_files = [f for f in z.namelist() if f.endswith('.json')]
-        total_files = len(json_files)
-        processed_files = 0
+        members = {info.filename: _member_fingerprint(info) for info in z.infolist()
+                   if info.filename.endswith('.json')}
+    json_files = list(members)
 
-        for filename in json_files:
-            # Extract game_id from the filename, assuming filename format is 'game_01.json'
-            game_id = filename.split('/')[-1].split('.')[0]
+    manifest_path = os.path.join(output_folder, MANIFEST_NAME)
+    manifest = _read_manifest(manifest_path) if incremental else {}
+    if incremental:
+        # drop the games of members removed from the archive, unless another member now holds the game
+        game_ids = {member['game_id'] for member in members.values()}
+        removed = [f for f in manifest if f not in members]
+        for filename in removed:
+            game_id = manifest.pop(filename).get('game_id')
+            game_path = os.path.join(output_folder, f"{game_id}.parquet")
+            if game_id not in game_ids and os.path.exists(game_path):
+                os.remove(game_path)
+        if removed:
+            print(f"{len(removed)} games removed since the last run")
 
-            try:
-                with z.open(filename) as file_content:
-                    # Pass the file-like object and game_id to the parsing function
-                    df = parse_cricket_json(file_content, game_id)
-                    df = add_columns(df)
+        # skip members whose content is unchanged and whose parquet file is still there
+        json_files = [f for f in json_files if manifest.get(f) != members[f] or
+                      not os.path.exists(os.path.join(output_folder, members[f]['game_id'] + ".parquet"))]
+        print(f"{len(members) - len(json_files)} games unchanged since the last run")
 
-                    output_file_name = game_id + ".parquet"
-                    output_file_path = os.path.join(output_folder, output_file_name)
-                    
-                    # Save the DataFrame as a Parquet file
-                    df.to_parquet(output_file_path, index=False)
+    total_files = len(json_files)
+    processed_members = []
+    errors = []
+    players = []
+
+    def report_progress(count):
+        progress_percentage = (count / total_files) * 100
+        print(f"Progress: {progress_percentage:.2f}%")
+
+    def on_processed(filename):
+        processed_members.append(filename)
+        report_progress(len(processed_members))
+
+    def iter_shard_results():
+        # yields the converted tables of each shard, in this process or across a process pool
+        shards = _shard_members(json_files, n_workers)
+        if n_workers == 1:
+            for shard in shards:
+                _, shard_errors, tables, shard_players = _convert_members(
+                    zip_file_path, shard, output_folder, output_format, on_processed, categorical, player_registry)
+                errors.extend(shard_errors)
+                players.append(shard_players)
+                yield tables
+        else:
+            remaining = iter(shards)
+            pending = set()
+            with ProcessPoolExecutor(max_workers=n_workers) as pool:
+                while True:
+                    # top up the window of in-flight shards as earlier ones finish
+                    while len(pending) < MAX_PENDING_SHARDS * n_workers:
+                        shard = next(remaining, None)
+                        if shard is None:
+                            break
+                        pending.add(pool.submit(_convert_members, zip_file_path, shard, output_folder,
+                                                output_format, None, categorical, player_registry))
+                    if not pending:
+                        break
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    while done:
+                        # drop the future before yielding, so its tables are freed once written
+                        processed, shard_errors, tables, shard_players = done.pop().result()
+                        errors.extend(shard_errors)
+                        players.append(shard_players)
+                        processed_members.extend(processed)
+                        report_progress(len(processed_members))
+                        yield tables
+                        del tables
+
+    if output_format == "dataset":
+        import pyarrow.dataset as ds
+
+        batches = (batch for tables in iter_shard_results() for table in tables
+                   for batch in table.to_batches())
+        ds.write_dataset(
+            batches, output_folder, schema=delivery_schema(categorical), format="parquet",
+            partitioning=["season"], partitioning_flavor="hive",
+            basename_template="part-{i}.parquet",
+            min_rows_per_group=row_group_size, max_rows_per_group=row_group_size,
+            existing_data_behavior="delete_matching"
+        )
+    elif n_workers == 1 or total_files <= 1:
+        _, errors, _, shard_players = _convert_members(zip_file_path, json_files, output_folder, output_format,
+                                                       on_processed, categorical, player_registry)
+        players.append(shard_players)
+    else:
+        for _ in iter_shard_results():
+            pass
+
+    if output_format == "files":
+        for filename in processed_members:
+            manifest[filename] = members[filename]
+        # members that failed this time must be retried on the next incremental run
+        for filename, _ in errors:
+            manifest.pop(filename, None)
+        _write_manifest(manifest, manifest_path)
+
+    if player_registry:
+        # keys and canonical names are assigned once, after all shards are in, in member order,
+        # so they don't depend on worker scheduling
+        players = pd.concat(players, ignore_index=True) if players else _empty_players()
+        players = players.sort_values('member', kind='stable', ignore_index=True)
+        registry = update_player_registry(read_player_registry(output_folder), players)
+        write_player_registry(registry, output_folder)
+
+        # store the compact integer keys on the deliveries that were just written
+        if output_format == "files":
+            game_files = [os.path.join(output_folder, members[filename]['game_id'] + ".parquet")
+                          for filename in sorted(processed_members)]
+        else:
+            game_files = parquet_data_files(output_folder)
+        _write_player_keys(game_files, registry, row_group_size)
+
+    for filename, message in sorted(errors):
+        print(f"Skipping {filename} due to an error: {message}")
+
+
+def _empty_players():
+    return pd.DataFrame({"player_id": pd.Series(dtype=object), "name": pd.Series(dtype=object),
+                         "member": pd.Series(dtype=object)})
+
+
+def _write_player_keys(file_paths, registry, batch_size):
+    """ Rewrite parquet files with the <role>_key columns of encode_player_keys, one batch at a time """
+    for file_path in file_paths:
+        parquet_file = pq.ParquetFile(file_path)
+        schema = parquet_file.schema_arrow.remove_metadata()
+        for role, (_, id_col) in PLAYER_COLUMNS.items():
+            if id_col in schema.names and role + "_key" not in schema.names:
+                schema = schema.append(pa.field(role + "_key", pa.int32()))
+
+        tmp_path = file_path + ".tmp"
+        with pq.ParquetWriter(tmp_path, schema) as writer:
+            for batch in parquet_file.iter_batches(batch_size=batch_size):
+                df = encode_player_keys(batch.to_pandas(), registry)
+                writer.write_table(pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False))
+        parquet_file.close()
+        os.replace(tmp_path, file_path)
+
+
+def game_players(df):
+    """ Collect the players that appear in a dataframe of deliveries
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe created by parse_cricket_json
+
+    Returns
+    -------
+    pd.DataFrame
+        Unique (player_id, name) pairs of every batter, bowler, non striker, dismissed player
+        and fielder. Deliveries without a player or with an "Unknown" ID are skipped.
+
+    Examples
+    --------
+    >>> game_players(df_game_232031)
+
+    """
+    pairs = pd.concat([
+        pd.DataFrame({"player_id": df[id_col].astype(str).to_numpy(), "name": df[name_col].astype(str).to_numpy()})
+        for name_col, id_col in PLAYER_COLUMNS.values() if id_col in df.columns
+    ], ignore_index=True)
+    pairs = pairs[(pairs['player_id'] != "") & (pairs['player_id'] != "Unknown")]
+    return pairs.drop_duplicates(ignore_index=True)
+
+
+def read_player_registry(folder):
+    """ Read the player registry stored in a data folder
+
+    Parameters
+    ----------
+    folder : str
+        Folder the registry was written to by process_cricket_jsons or write_player_registry
+
+    Returns
+    -------
+    pd.DataFrame
+        Registry with the columns player_key (int32), player_id and name, where player_key
+        equals the row position. Empty if the folder has no registry yet.
+
+    Examples
+    --------
+    >>> registry = read_player_registry('data/t20s_parquet')
+    >>> registry.loc[registry['player_key'] == 42, 'name']
+
+    """
+    registry_path = os.path.join(folder, REGISTRY_NAME)
+    if not os.path.exists(registry_path):
+        return pd.DataFrame({"player_key": pd.Series(dtype='int32'), "player_id": pd.Series(dtype=object),
+                             "name": pd.Series(dtype=object)})
+    return pd.read_parquet(registry_path)
 
-            except Exception as e:
-                continue 
-            
-            processed_files += 1
-            progress_percentage = (processed_files / total_files) * 100
-            print(f"Progress: {progress_percentage:.2f}%")
 
+def write_player_registry(registry, folder):
+    """ Write a player registry next to the data in folder, replacing the previous one atomically
 
-def determine_majority_dtypes(parquet_files, input_folder):
+    Parameters
+    ----------
+    registry : pd.DataFrame
+        Registry from update_player_registry
+
+    folder : str
+        Folder to write the registry to
+
+    Returns
+    -------
+    None
+
+    Examples
+    --------
+    >>> write_player_registry(registry, 'data/t20s_parquet')
+
+    """
+    registry_path = os.path.join(folder, REGISTRY_NAME)
+    tmp_path = registry_path + ".tmp"
+    registry.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, registry_path)
+
+
+def update_player_registry(registry, players):
+    """ Add new players to a player registry, keeping the keys of the players it already has
+
+    Parameters
+    ----------
+    registry : pd.DataFrame
+        Registry from read_player_registry
+
+    players : pd.DataFrame
+        player_id and name pairs, for example from game_players
+
+    Returns
+    -------
+    pd.DataFrame
+        Registry with the new player IDs appended in sorted order and given the next integer keys.
+        The first name of an ID in the order of players is kept as its canonical name.
+
+    Examples
+    --------
+    >>> registry = update_player_registry(read_player_registry('data/t20s_parquet'), game_players(df_game_232031))
+
+    """
+    new_players = players.drop_duplicates('player_id')
+    new_players = new_players[~new_players['player_id'].isin(registry['player_id'])]
+    new_players = new_players.sort_values('player_id', ignore_index=True)
+
+    start = len(registry)
+    new_players = pd.DataFrame({
+        "player_key": np.arange(start, start + len(new_players), dtype='int32'),
+        "player_id": new_players['player_id'].to_numpy(),
+        "name": new_players['name'].to_numpy()
+    })
+    return pd.concat([registry, new_players], ignore_index=True).astype({"player_key": 'int32'})
+
+
+def encode_player_keys(df, registry, drop_strings=False):
+    """ Replace the player IDs of deliveries with the integer keys of the global player registry
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Dataframe of deliveries
+
+    registry : pd.DataFrame
+        Registry from read_player_registry
+
+    drop_strings : bool
+        Drop the player name and ID string columns once the keys are added
+
+    Returns
+    -------
+    pd.DataFrame
+        Returns the dataframe with a <role>_key (int32) column per role in PLAYER_COLUMNS, for example
+        batter_key and fielders_key. Players missing from the registry get the key -1.
+
+    Examples
+    --------
+    >>> registry = read_player_registry('data/t20s_parquet')
+    >>> encode_player_keys(df_game_232031, registry)
+
+    """
+    ids = pd.Index(registry['player_id'].astype(str))
+    # position -1 (not in the registry) picks up the trailing -1
+    keys = np.append(registry['player_key'].to_numpy(dtype='int32'), np.int32(-1))
+    for role, (name_col, id_col) in PLAYER_COLUMNS.items():
+        if id_col not in df.columns:
+            continue
+        positions = ids.get_indexer(df[id_col].astype(str))
+        df[role + "_key"] = keys[positions]
+        if drop_strings:
+            df = df.drop(columns=[name_col, id_col])
+    return df
+
+
+def _metadata_dtypes(file_path):
+    """ Pandas dtypes of a parquet file, read from its footer without loading any rows """
+    schema = pq.read_schema(file_path)
+    return schema.empty_table().to_pandas().dtypes
+
+
+def determine_majority_dtypes(parquet_files, input_folder, sample_size=21, metadata_only=False):
     """ Determine the majority data type for each column across a sample of Parquet files.
     
     Parameters
@@ -203,6 +887,14 @@ def determine_majority_dtypes(parquet_files, input_folder):
     input_folder: str
         Filepath of directory containing parquet files.
 
+    sample_size: int
+        Number of files, from the start of parquet_files, that are read to vote on the data types.
+        Ignored when metadata_only is True.
+
+    metadata_only: bool
+        Vote across all files using only the schemas in the parquet footers instead of reading the
+        sampled files in full, and print the files whose types disagree with the majority.
+
     Returns
     -------
     dict
@@ -211,18 +903,23 @@ def determine_majority_dtypes(parquet_files, input_folder):
     Examples
     --------
     >>> determine_majority_dtypes(['2203.parquet', '21332.parquet'], 'data/t20s_parquet')
+    >>> determine_majority_dtypes(os.listdir('data/t20s_parquet'), 'data/t20s_parquet', metadata_only=True)
 
     """
 
-    sample_size=21
     dtype_votes = defaultdict(lambda: defaultdict(int))
+    file_dtypes = {}
     
-    for filename in parquet_files[:sample_size]:
+    for filename in (parquet_files if metadata_only else parquet_files[:sample_size]):
         file_path = os.path.join(input_folder, filename)
         try:
-            df = pd.read_parquet(file_path)
+            if metadata_only:
+                dtypes = _metadata_dtypes(file_path)
+                file_dtypes[filename] = dtypes
+            else:
+                dtypes = pd.read_parquet(file_path).dtypes
             # Corrected iteration over DataFrame dtypes
-            for col, dtype in df.dtypes.items():
+            for col, dtype in dtypes.items():
                 dtype_votes[col][str(dtype)] += 1
         except Exception as e:
             print(f"Error processing {filename}: {e}")
@@ -232,9 +929,60 @@ def determine_majority_dtypes(parquet_files, input_folder):
     for col, votes in dtype_votes.items():
         majority_dtypes[col] = max(votes, key=votes.get)
 
+    if metadata_only:
+        for filename, dtypes in file_dtypes.items():
+            for col, dtype in _disagreeing_dtypes(dtypes, majority_dtypes).items():
+                print(f"{filename}: column {col} is {dtype}, majority is {majority_dtypes[col]}")
+
     return majority_dtypes
 
-def apply_dtypes_and_concatenate(parquet_files, input_folder, dtype_mapping):
+
+def _disagreeing_dtypes(dtypes, dtype_mapping):
+    """ Columns of a file whose dtype differs from the mapping """
+    return {col: str(dtype) for col, dtype in dtypes.items()
+            if col in dtype_mapping and str(dtype) != dtype_mapping[col]}
+
+
+def dtype_disagreements(parquet_files, input_folder, dtype_mapping):
+    """ Find the Parquet files whose column data types disagree with a data type mapping.
+
+    Only the schemas in the parquet footers are read.
+
+    Parameters
+    ----------
+    parquet_files : list(str)
+        List of parquet file names.
+    
+    input_folder: str
+        Filepath of directory containing parquet files.
+
+    dtype_mapping: dict
+        Dictionary containing data type mapping
+
+    Returns
+    -------
+    dict
+        Maps the name of each disagreeing file to a dictionary of {column: dtype in that file}
+
+    Examples
+    --------
+    >>> majority_mapping = determine_majority_dtypes(['2203.parquet', '21332.parquet'], 'data/t20s_parquet')
+    >>> dtype_disagreements(['2203.parquet', '21332.parquet'], 'data/t20s_parquet', majority_mapping)
+
+    """
+    disagreements = {}
+    for filename in parquet_files:
+        file_path = os.path.join(input_folder, filename)
+        try:
+            mismatched = _disagreeing_dtypes(_metadata_dtypes(file_path), dtype_mapping)
+        except Exception as e:
+            print(f"Error processing {filename}: {e}")
+            continue
+        if mismatched:
+            disagreements[filename] = mismatched
+    return disagreements
+
+def apply_dtypes_and_concatenate(parquet_files, input_folder, dtype_mapping, categorical=False):
     
     """ Apply data type mapping to DataFrames, handle specific cases, and concatenate them.
     
@@ -249,6 +997,10 @@ def apply_dtypes_and_concatenate(parquet_files, input_folder, dtype_mapping):
     
     dtype_mapping: dict
         Dictionary containing data type mapping 
+
+    categorical: bool
+        Convert the CATEGORICAL_COLUMNS to pandas categoricals. Categorical columns share one
+        set of categories across all files, so they stay categorical after concatenation.
     
     Returns
     ----------
@@ -265,22 +1017,245 @@ def apply_dtypes_and_concatenate(parquet_files, input_folder, dtype_mapping):
     for filename in parquet_files:
         file_path = os.path.join(input_folder, filename)
         try:
-            df = pd.read_parquet(file_path)
-            # Apply general dtype mapping
-            for col, dtype_str in dtype_mapping.items():
-                if col in df.columns:
-                    df[col] = df[col].astype(dtype_str, errors='ignore')
-            # Handle specific cases
-            if 'season' in df.columns:
-                df['season'] = df['season'].astype(str)  # Convert 'season' to string
-            dfs.append(df)
+            df = _read_with_dtypes(file_path, dtype_mapping)
+            dfs.append(to_categorical(df) if categorical else df)
         except Exception as e:
             print(f"Skipping {filename} due to an error: {e}")
     
     if dfs:
+        _unify_categories(dfs)
         merged_df = pd.concat(dfs, ignore_index=True)
         # Additional specific dtype adjustments if necessary
         return merged_df
     else:
         print("No valid Parquet files were found or successfully read.")
         return pd.DataFrame()
+
+
+def _read_with_dtypes(file_path, dtype_mapping):
+    """ Read one parquet file and apply the dtype mapping the way apply_dtypes_and_concatenate does """
+    df = pd.read_parquet(file_path)
+    # Apply general dtype mapping
+    for col, dtype_str in dtype_mapping.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype_str, errors='ignore')
+    # Handle specific cases
+    if 'season' in df.columns:
+        df['season'] = df['season'].astype(str)  # Convert 'season' to string
+        if dtype_mapping.get('season') == 'category':
+            df['season'] = df['season'].astype('category')
+    return df
+
+
+def _arrow_type(dtype_str):
+    """ Arrow type used to store a column of the given pandas dtype """
+    if dtype_str in ('object', 'str', 'string'):
+        return pa.string()
+    elif dtype_str == 'category':
+        return pa.dictionary(pa.int32(), pa.string())
+    return pa.from_numpy_dtype(np.dtype(dtype_str))
+
+
+def dtype_mapping_schema(dtype_mapping):
+    """ Build the Arrow schema that corresponds to a dtype mapping from determine_majority_dtypes
+
+    Parameters
+    ----------
+    dtype_mapping: dict
+        Dictionary containing data type mapping
+
+    Returns
+    ----------
+    pyarrow.Schema
+        Schema with one field per mapped column, in mapping order. 'season' is always a string,
+        dictionary-encoded if it is mapped to 'category'.
+
+    Examples
+    ----------
+    >>> dtype_mapping_schema({'over': 'int64', 'season': 'object'})
+    """
+    return pa.schema([(col, pa.string() if col == 'season' and dtype_str != 'category' else _arrow_type(dtype_str))
+                      for col, dtype_str in dtype_mapping.items()])
+
+
+def iter_dtype_batches(parquet_files, input_folder, dtype_mapping, batch_size=65536):
+    """ Apply data type mapping to parquet files one at a time and yield the result as Arrow record batches.
+
+    Only one file is held in memory at a time, so the data can be processed without concatenating it.
+    All batches share the schema from dtype_mapping_schema: columns missing from a file are filled
+    with nulls and columns that are not in the mapping are dropped. Columns mapped to 'category'
+    are yielded dictionary-encoded.
+
+    Parameters
+    ----------
+    parquet_files: list(str)
+        List of parquet file names
+    
+    input_folder: str
+        File path of directory containing parquet files
+    
+    dtype_mapping: dict
+        Dictionary containing data type mapping
+
+    batch_size: int
+        Maximum number of rows per record batch
+
+    Returns
+    ----------
+    generator of pyarrow.RecordBatch
+        Record batches with the majority data types enforced on columns
+
+    Examples
+    ----------
+    >>> majority_mapping = determine_majority_dtypes(['2203.parquet', '21332.parquet'], 'data/t20s_parquet')
+    >>> for batch in iter_dtype_batches(['2203.parquet', '21332.parquet'], 'data/t20s_parquet', majority_mapping):
+    >>>     print(batch.num_rows)
+    """
+    schema = dtype_mapping_schema(dtype_mapping)
+    for filename in parquet_files:
+        file_path = os.path.join(input_folder, filename)
+        try:
+            df = _read_with_dtypes(file_path, dtype_mapping)
+            df = df.reindex(columns=schema.names)
+            table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        except Exception as e:
+            print(f"Skipping {filename} due to an error: {e}")
+            continue
+        yield from table.to_batches(max_chunksize=batch_size)
+
+
+def apply_dtypes_and_write(parquet_files, input_folder, dtype_mapping, output_path, row_group_size=131072):
+    """ Apply data type mapping to parquet files and stream them into a single parquet file.
+
+    A bounded-memory alternative to apply_dtypes_and_concatenate: files are cast and appended
+    to the output one at a time instead of being concatenated in memory.
+
+    Parameters
+    ----------
+    parquet_files: list(str)
+        List of parquet file names
+    
+    input_folder: str
+        File path of directory containing parquet files
+    
+    dtype_mapping: dict
+        Dictionary containing data type mapping
+
+    output_path: str
+        File path of the parquet file to write
+
+    row_group_size: int
+        Maximum number of rows per parquet row group
+
+    Returns
+    ----------
+    int
+        Number of rows written
+
+    Examples
+    ----------
+    >>> majority_mapping = determine_majority_dtypes(['2203.parquet', '21332.parquet'], 'data/t20s_parquet')
+    >>> apply_dtypes_and_write(['2203.parquet', '21332.parquet'], 'data/t20s_parquet', majority_mapping, 'data/cricket_main.parquet')
+    """
+    output_folder = os.path.dirname(output_path)
+    if output_folder and not os.path.exists(output_folder):
+        os.makedirs(output_folder)
+
+    schema = dtype_mapping_schema(dtype_mapping)
+    n_rows = 0
+    # small per-game batches are buffered so row groups come out close to row_group_size
+    buffer = []
+    buffered_rows = 0
+    with pq.ParquetWriter(output_path, schema) as writer:
+        for batch in iter_dtype_batches(parquet_files, input_folder, dtype_mapping, batch_size=row_group_size):
+            buffer.append(batch)
+            buffered_rows += batch.num_rows
+            n_rows += batch.num_rows
+            if buffered_rows >= row_group_size:
+                writer.write_table(pa.Table.from_batches(buffer, schema=schema), row_group_size=row_group_size)
+                buffer = []
+                buffered_rows = 0
+        if buffer:
+            writer.write_table(pa.Table.from_batches(buffer, schema=schema), row_group_size=row_group_size)
+
+    return n_rows
+
+
+def parquet_data_files(path):
+    """ List the data files of a parquet file or (partitioned) directory of parquet files.
+    
+    Parameters
+    ----------
+    path : str
+        Parquet file or directory of parquet files
+
+    Returns
+    -------
+    list(str)
+        Paths of the parquet files, in sorted order. Files and directories starting with '_' or '.',
+        such as the manifest and player registry, are skipped.
+
+    Examples
+    --------
+    >>> parquet_data_files('data/t20s_dataset')
+
+    """
+    if os.path.isfile(path):
+        return [path]
+    files = []
+    for root, dirs, names in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(('_', '.')))
+        files += [os.path.join(root, name) for name in sorted(names)
+                  if name.endswith('.parquet') and not name.startswith(('_', '.'))]
+    return files
+
+
+def _file_digest(file_path):
+    """ SHA-256 of the bytes of a file, read in blocks so large files are never held in memory at once """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def data_fingerprint(path, cache=None):
+    """ Fingerprint the content of a parquet file or directory.
+
+    Hashes the relative path and the bytes of every parquet file, so any change to the data changes
+    the fingerprint. With a cache, files whose size and modification time are unchanged since their
+    digest was cached are not read again.
+    
+    Parameters
+    ----------
+    path : str
+        Parquet file or directory of parquet files
+
+    cache : dict, optional
+        Digests of earlier calls, {file path: [size, mtime_ns, digest]}, updated in place.
+        It is plain JSON, so it can be saved between runs.
+
+    Returns
+    -------
+    str
+        Hex SHA-256 digest
+
+    Examples
+    --------
+    >>> data_fingerprint('data/t20s_parquet')
+    >>> cache = {}
+    >>> data_fingerprint('data/t20s_parquet', cache)
+
+    """
+    digest = hashlib.sha256()
+    for file_path in parquet_data_files(path):
+        stat = os.stat(file_path)
+        cached = cache.get(file_path) if cache is not None else None
+        if cached is not None and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            file_digest = cached[2]
+        else:
+            file_digest = _file_digest(file_path)
+            if cache is not None:
+                cache[file_path] = [stat.st_size, stat.st_mtime_ns, file_digest]
+        digest.update(f"{os.path.relpath(file_path, path)}:{stat.st_size}:{file_digest}\n".encode())
+    return digest.hexdigest()
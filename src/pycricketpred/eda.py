@@ -1,17 +1,98 @@
 import numpy as np
 import pandas as pd
-import altair as alt
 import os
-import matplotlib.pyplot as plt
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+class ColumnAggregates:
+    """ Delivery counts and wicket sums per value of a column, computed once per column and cached.
+
+    Charts built from the aggregates hold one row per value of the column instead of every delivery.
+    Pass the same ColumnAggregates to vis_bar and hist_chart to aggregate each column only once.
+    A DataFrame source is neither copied nor modified: only its charted column and 'wicket' are read,
+    as views. The cache assumes the source does not change, so aggregate a modified frame again.
+
+    Parameters
+    ----------
+    source: pd.DataFrame or str
+        Deliveries, or a parquet file or (hive-partitioned) directory of parquet files.
+        Parquet sources are aggregated with pyarrow, reading only the charted column and 'wicket'.
+
+    Attributes
+    ----------
+    columns: list(str)
+        Columns of the source
+
+    empty: bool
+        True if the source holds no deliveries
+
+    Examples
+    ----------
+    >>> aggregates = ColumnAggregates('data/cricket_main.parquet')
+    >>> aggregates['over']
+    >>> vis_bar(aggregates, 'over', 300, 200)
+    >>> hist_chart(aggregates, 'over', 'chart1.png', 'images/')
+    """
+
+    def __init__(self, source):
+        if isinstance(source, pd.DataFrame):
+            self.columns = list(source.columns)
+            self.empty = source.empty
+            self._dataset = None
+        elif isinstance(source, str):
+            import pyarrow.dataset as ds
+
+            self._dataset = ds.dataset(source, format="parquet", partitioning="hive")
+            self.columns = self._dataset.schema.names
+            self.empty = self._dataset.count_rows() == 0
+        else:
+            raise TypeError("source must be a pandas DataFrame or a parquet path")
+        self._source = source
+        self._cache = {}
+
+    def __getitem__(self, col):
+        """ DataFrame with the values of col, their number of deliveries ('count') and wickets ('wickets'),
+        sorted by value. 'wickets' is only present if the source has a 'wicket' column """
+        if col not in self.columns:
+            raise KeyError("Column must be in DataFrame")
+        if col not in self._cache:
+            self._cache[col] = self._aggregate(col)
+        return self._cache[col]
+
+    def _aggregate(self, col):
+        has_wicket = 'wicket' in self.columns
+        if self._dataset is not None:
+            import pyarrow as pa
+
+            table = self._dataset.to_table(columns=list(dict.fromkeys([col, 'wicket'] if has_wicket else [col])))
+            # files of a dataset each have their own dictionaries, which group_by cannot unify
+            field = table.schema.field(col)
+            if pa.types.is_dictionary(field.type):
+                table = table.set_column(table.schema.get_field_index(col), col, table[col].cast(field.type.value_type))
+            aggregations = [(col, "count")] + ([('wicket', "sum")] if has_wicket else [])
+            result = table.group_by(col).aggregate(aggregations).to_pandas()
+            result = result.rename(columns={f"{col}_count": "count", "wicket_sum": "wickets"})
+            result = result.dropna(subset=[col]).sort_values(col, ignore_index=True)
+        elif has_wicket:
+            grouped = self._source['wicket'].groupby(self._source[col], observed=True)
+            result = grouped.agg(['size', 'sum']).rename(columns={'size': 'count', 'sum': 'wickets'})
+            result = result.rename_axis(col).reset_index()
+        else:
+            result = self._source[col].value_counts().sort_index().rename('count').rename_axis(col).reset_index()
+        return result[[col, 'count', 'wickets'] if has_wicket else [col, 'count']]
 
 
 def vis_bar(data, x_input, width, height):
     """ Plot the distribution of a specified variable in the dataset
 
+    The deliveries are counted per value before charting, so the chart only holds the aggregated rows.
+    A nominal (':N') column is converted to strings in the aggregated rows, never in data.
+
     Parameters
     ----------
-    data: pd.DataFrame
-        Dataframe to plot the distribution based off of
+    data: pd.DataFrame or ColumnAggregates
+        Dataframe to plot the distribution based off of, or its cached aggregates
     
     x_input: str
         Column to plot the distribution for
@@ -53,14 +134,19 @@ def vis_bar(data, x_input, width, height):
         raise KeyError("Column must be in DataFrame")
     # create chart
     else:
+        import altair as alt
 
+        aggregates = data if isinstance(data, ColumnAggregates) else ColumnAggregates(data)
         # transform nominal columns
         if x_input[-2:] == ':N':
             x_input = x_input[:-2]
-            data[x_input] = data[x_input].astype(str)
-        chart = alt.Chart(data).mark_bar().encode(
+            counts = aggregates[x_input]
+            counts = counts.assign(**{x_input: counts[x_input].astype(str)})
+        else:
+            counts = aggregates[x_input]
+        chart = alt.Chart(counts).mark_bar().encode(
             x = x_input,
-            y = "count()"
+            y = alt.Y("count:Q", title="Count of Records")
         ).properties(
             width = width, 
             height = height
@@ -73,8 +159,8 @@ def hist_chart(data, col, chart_name, save_path):
 
     Parameters
     ----------
-    data: pd.DataFrame
-        Dataframe based off of which the plots are created
+    data: pd.DataFrame or ColumnAggregates
+        Dataframe based off of which the plots are created, or its cached aggregates
     
     column: str
         Category for which the wicket distribution will be plotted. Has to be a categorical variable.
@@ -94,9 +180,6 @@ def hist_chart(data, col, chart_name, save_path):
     >>> hist_chart(data_cricket, 'inning', 'chart1.png', 'images/')
     """
     # check for type of filepath/name
-    if not os.path.exists(save_path):
-        os.makedirs(save_path)
-
     if type(chart_name) != str or type(save_path) != str:
         raise TypeError("Chart name and file paths must be strings")
     
@@ -113,7 +196,98 @@ def hist_chart(data, col, chart_name, save_path):
         raise KeyError("Column must be in DataFrame")
 
     else:
-        count_wicket = data.groupby(col)['wicket'].sum()
-        chart = count_wicket.plot(kind = 'bar', xlabel=f"{col}", ylabel="Wicket Count")
-        fig = chart.get_figure()
-        fig.savefig(os.path.join(save_path, chart_name))
\ No newline at end of file
+        # only create the folder once the inputs are valid
+        if not os.path.exists(save_path):
+            os.makedirs(save_path)
+        aggregates = data if isinstance(data, ColumnAggregates) else ColumnAggregates(data)
+        count_wicket = aggregates[col].set_index(col)['wickets']
+        _render_wicket_charts([(col, count_wicket, os.path.join(save_path, chart_name))])
+
+
+def _render_wicket_charts(charts):
+    """ Draw and save (column, wicket sums, file path) bar charts on one reused figure, returning the render times.
+
+    The figure is created without pyplot, so it is never registered globally, renders with Agg
+    whatever the configured backend, and is released when the function returns.
+    """
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    ax = fig.add_subplot()
+    timings = []
+    for col, count_wicket, file_path in charts:
+        start = time.perf_counter()
+        ax.clear()
+        count_wicket.plot(kind = 'bar', ax=ax, xlabel=f"{col}", ylabel="Wicket Count")
+        fig.savefig(file_path)
+        timings.append((col, file_path, time.perf_counter() - start))
+    return timings
+
+
+def hist_charts(data, columns, save_path, n_workers=1, file_format="png"):
+    """ Create and save the distribution of wickets across the categories of several columns
+
+    Every column is aggregated once, then its chart is drawn with hist_chart's layout. Each process
+    draws its charts on a single reused figure, so no figure leaks between charts.
+
+    Parameters
+    ----------
+    data: pd.DataFrame or ColumnAggregates
+        Dataframe based off of which the plots are created, or its cached aggregates
+
+    columns: list(str)
+        Categories for which the wicket distribution will be plotted
+
+    save_path: str
+        File path to save the charts to, as wickets_<column>.<file_format>
+
+    n_workers: int
+        Number of worker processes rendering the charts. The default of 1 renders in this process.
+
+    file_format: str
+        Image format of the charts, e.g. "png" or "svg"
+
+    Returns
+    ----------
+    pd.DataFrame
+        column, path and render_seconds of every chart, in the order of columns
+
+    Examples
+    ----------
+    >>> hist_charts(data_cricket, ['inning', 'over', 'powerplay'], 'images/')
+    >>> hist_charts(ColumnAggregates('data/cricket_main.parquet'), ['over', 'season'], 'images/', n_workers=2)
+    """
+    if type(save_path) != str or type(file_format) != str:
+        raise TypeError("File paths and formats must be strings")
+
+    elif not isinstance(columns, list) or any(type(col) != str for col in columns):
+        raise TypeError("Columns must be a list of strings")
+
+    elif type(n_workers) != int or n_workers < 1:
+        raise ValueError("n_workers must be a positive integer")
+
+    elif data.empty == True:
+        raise ValueError("DataFrame shouldn't be empty")
+
+    elif any(col not in data.columns for col in columns) or 'wicket' not in data.columns:
+        raise KeyError("Column must be in DataFrame")
+
+    if not os.path.exists(save_path):
+        os.makedirs(save_path)
+    aggregates = data if isinstance(data, ColumnAggregates) else ColumnAggregates(data)
+    charts = [(col, aggregates[col].set_index(col)['wickets'], os.path.join(save_path, f"wickets_{col}.{file_format}"))
+              for col in columns]
+
+    if n_workers == 1:
+        timings = _render_wicket_charts(charts)
+    else:
+        # only the aggregated rows are sent to the workers
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            shards = pool.map(_render_wicket_charts, [charts[i::n_workers] for i in range(n_workers)])
+            timings = [timing for shard in shards for timing in shard]
+
+    report = pd.DataFrame(timings, columns=['column', 'path', 'render_seconds'])
+    report = report.set_index('column').loc[columns].reset_index()
+    for col, path, seconds in report.itertuples(index=False):
+        print(f"{path}: rendered in {seconds:.3f}s")
+    return report
\ No newline at end of file
@@ -1,16 +1,120 @@
 import numpy as np
 import pandas as pd
 import os
-import matplotlib.pyplot as plt
-import sklearn.metrics as metrics
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LogisticRegression
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.impute import SimpleImputer
-from sklearn.pipeline import make_pipeline
-from sklearn.compose import make_column_transformer
-
-def split_train_test(parquet_path):
+import hashlib
+import pickle
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict
+import pyarrow.parquet as pq
+
+# columns used by the column transformer
+NUMERICAL_FEATS = ['runs_cumulative']
+CATEGORICAL_FEATS = ['inning', 'over', 'powerplay', 'over_ball']
+DROP_FEATS = ['game_id', 'season', 'team','batter', 'batter_id', 'bowler',
+    'bowler_id', 'non_striker', 'non_striker_id', 'wides', 'noballs',
+    'legbyes', 'byes', 'player_out', 'player_out_id', 'fielders_name',
+    'fielders_id', 'wicket_type', 'runs_batter', 'runs_extras', 
+    'runs_total', 'team_over']
+
+# the predictor columns the model actually uses
+MODEL_FEATS = NUMERICAL_FEATS + CATEGORICAL_FEATS
+
+# numerical match-state columns added by add_match_state, used by transformer(match_state=True)
+MATCH_STATE_FEATS = ['wickets_fallen', 'run_rate', 'balls_since_wicket', 'batter_balls', 'batter_runs']
+
+# default size limit of the encoded feature cache, see encode_features
+MAX_CACHE_BYTES = 2 * 1024 ** 3
+
+
+def read_model_data(parquet_path, columns=None, filters=None):
+    """ Read deliveries from a parquet file or directory with column projection and filter pushdown.
+
+    The file is memory-mapped and only the requested columns and the row groups / partitions
+    that can match the filters are read.
+
+    Parameters 
+    ----------
+    parquet_path: str
+        File path pointing to a parquet file or a directory containing parquet files
+    
+    columns: list(str), optional
+        Columns to read. All columns are read by default.
+
+    filters: dict, optional
+        Maps a column to the list of values to keep, for example {'season': ['2016/17']}
+    
+    Returns
+    ----------
+    pd.DataFrame
+        The deliveries read
+
+    Example
+    ----------
+    >>> read_model_data('data/t20s_parquet', columns=MODEL_FEATS + ['wicket'], filters={'team': ['India']})
+    """
+    if filters is not None and not isinstance(filters, dict):
+        raise TypeError("filters must be a dictionary")
+
+    pushdown = [(col, 'in', list(values)) for col, values in filters.items()] if filters else None
+    table = pq.read_table(parquet_path, columns=columns, filters=pushdown, memory_map=True)
+    # split_blocks avoids consolidating the columns into one block, so numeric columns convert without copies
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+def _filter_expression(filters):
+    """ Combine a {column: values} dictionary into a pyarrow dataset filter expression """
+    import pyarrow.dataset as ds
+
+    expression = None
+    for col, values in filters.items():
+        condition = ds.field(col).isin(list(values))
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def iter_model_batches(parquet_path, columns=None, filters=None, batch_size=65536):
+    """ Stream deliveries from a parquet file or directory as pandas DataFrames of bounded size.
+
+    Parameters 
+    ----------
+    parquet_path: str
+        File path pointing to a parquet file or a directory containing parquet files
+    
+    columns: list(str), optional
+        Columns to read. All columns are read by default.
+
+    filters: dict, optional
+        Maps a column to the list of values to keep, for example {'season': ['2016/17']}
+
+    batch_size: int
+        Maximum number of rows per DataFrame
+    
+    Returns
+    ----------
+    generator of pd.DataFrame
+        The deliveries, batch by batch
+
+    Example
+    ----------
+    >>> for batch in iter_model_batches('data/t20s_parquet', columns=MODEL_FEATS + ['wicket']):
+    >>>     print(len(batch))
+    """
+    if filters is not None and not isinstance(filters, dict):
+        raise TypeError("filters must be a dictionary")
+
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(parquet_path, format="parquet", partitioning="hive")
+    expression = _filter_expression(filters) if filters else None
+    for batch in dataset.to_batches(columns=columns, filter=expression, batch_size=batch_size):
+        if batch.num_rows:
+            yield batch.to_pandas()
+
+
+def split_train_test(parquet_path, columns=None, filters=None):
     """
     Read data from the provided path, exclude the 'wicket' column, 
     partition the data into training and testing sets with a 7:3 ratio, 
@@ -20,6 +124,14 @@ def split_train_test(parquet_path):
     ----------
     parquet_path: str
         File path pointing to directory containing all parquet files
+
+    columns: list(str), optional
+        Predictor columns to read, for example MODEL_FEATS. All columns are read by default.
+        Build the transformer with transformer(ohe, scaler, drop_feats=[]) for projected data.
+
+    filters: dict, optional
+        Maps a column to the list of values to keep, for example {'season': ['2016/17']}.
+        The filter is pushed down into the parquet scan.
     
     Returns
     ----------
@@ -38,8 +150,13 @@ def split_train_test(parquet_path):
     Example
     ----------
     >>> split_train_test('data/t20s_parquet')
+    >>> split_train_test('data/t20s_parquet', columns=MODEL_FEATS, filters={'season': ['2016/17', '2017/18']})
     """
-    data = pd.read_parquet(parquet_path)
+    from sklearn.model_selection import train_test_split
+
+    if columns is not None:
+        columns = [col for col in columns if col != 'wicket'] + ['wicket']
+    data = read_model_data(parquet_path, columns=columns, filters=filters)
     X = data.drop(columns = ['wicket'])
     y = data['wicket']
     X_train, X_test, y_train, y_test = train_test_split(X, y, train_size=0.7, random_state=123)
@@ -64,11 +181,77 @@ def preprocessing():
     ----------
     >>> preprocessing()
     """
+    from sklearn.preprocessing import StandardScaler, OneHotEncoder
+
     ohe = OneHotEncoder(drop = "if_binary", handle_unknown='ignore')
     scaler = StandardScaler()
     return ohe, scaler
 
-def transformer(ohe, scaler): 
+def add_match_state(df):
+    """ Take in a dataframe of deliveries and add the state of the match before each delivery
+    Extra columns added are:
+    wickets_fallen (wickets lost so far in the inning: int),
+    run_rate (runs per over so far in the inning, 0 before the first legal ball: float),
+    balls_since_wicket (legal balls bowled since the last wicket of the inning: int),
+    batter_balls (balls faced so far in the inning by the batter on strike: int),
+    batter_runs (runs scored so far in the inning by the batter on strike: int)
+
+    The columns only count earlier deliveries, never the delivery itself, so they hold no
+    information about its outcome. They are computed with grouped cumulative sums per game,
+    inning and batter, in linear time over any number of concatenated games. The deliveries
+    of every inning must be in the order they were bowled, as written by process_cricket_jsons.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Deliveries with the columns added by add_columns
+
+    Returns
+    -------
+    df: pd.DataFrame
+        Returns a dataframe with the added columns
+
+    Examples
+    --------
+    >>> data = add_match_state(pd.read_parquet('data/cricket_main.parquet'))
+    >>> X_train, X_test, y_train, y_test = train_test_split(data.drop(columns=['wicket']), data['wicket'])
+    >>> ohe, scaler = preprocessing()
+    >>> build_final_model(transformer(ohe, scaler, match_state=True), X_train, y_train)
+
+    """
+    required = ['game_id', 'inning', 'batter', 'wicket', 'runs_batter', 'runs_total', 'wides', 'noballs']
+    if any(col not in df.columns for col in required):
+        raise KeyError("Columns are missing")
+
+    # integer group keys, so the groupbys below hash integers instead of strings
+    game_codes, _ = pd.factorize(df['game_id'])
+    inning = df['inning'].to_numpy()
+    batter_codes, _ = pd.factorize(df['batter_id'] if 'batter_id' in df.columns else df['batter'])
+    innings_keys = [game_codes, inning]
+
+    wicket = df['wicket'].to_numpy()
+    # wides don't count as a ball faced, neither wides nor no-balls count as a legal ball of the over
+    faced = (df['wides'].to_numpy() == 0).astype('int64')
+    legal = faced * (df['noballs'].to_numpy() == 0)
+
+    def before(values, keys):
+        # grouped running total of the earlier deliveries
+        return pd.Series(values).groupby(keys, sort=False).cumsum().to_numpy() - values
+
+    wickets_fallen = before(wicket, innings_keys)
+    legal_balls = before(legal, innings_keys)
+    runs = before(df['runs_total'].to_numpy(), innings_keys)
+
+    df['wickets_fallen'] = wickets_fallen
+    df['run_rate'] = np.divide(6.0 * runs, legal_balls, out=np.zeros(len(df)), where=legal_balls > 0)
+    # every wicket starts a new partnership segment of the inning
+    df['balls_since_wicket'] = before(legal, innings_keys + [wickets_fallen])
+    df['batter_balls'] = before(faced, innings_keys + [batter_codes])
+    df['batter_runs'] = before(df['runs_batter'].to_numpy(), innings_keys + [batter_codes])
+
+    return df
+
+def transformer(ohe, scaler, drop_feats=None, match_state=False): 
     """ Assign the relevant features to the preprocessors within the transformer and provide the resulting transformer.
 
     Parameters
@@ -78,6 +261,12 @@ def transformer(ohe, scaler):
     
     scaler: StandardScaler
         A standard scaler used to transform all the numerical variables
+
+    drop_feats: list(str), optional
+        Columns to drop, DROP_FEATS by default. Pass [] when the data only has the MODEL_FEATS columns.
+
+    match_state: bool
+        Also scale and use the MATCH_STATE_FEATS columns, see add_match_state
     
     Returns
     ----------
@@ -89,25 +278,149 @@ def transformer(ohe, scaler):
     >>> from pycricketpred.modelling import preprocessing
     >>> ohe, scaler = preprocessing()
     >>> transformer(ohe, scaler)
+    >>> transformer(ohe, scaler, match_state=True)
 
     """
-    numerical_feats = ['runs_cumulative']
-    categorical_feats = ['inning', 'over', 'powerplay', 'over_ball']
-    drop_feats = ['game_id', 'season', 'team','batter', 'batter_id', 'bowler',
-        'bowler_id', 'non_striker', 'non_striker_id', 'wides', 'noballs',
-        'legbyes', 'byes', 'player_out', 'player_out_id', 'fielders_name',
-        'fielders_id', 'wicket_type', 'runs_batter', 'runs_extras', 
-        'runs_total', 'team_over']
+    from sklearn.compose import make_column_transformer
+
+    if drop_feats is None:
+        drop_feats = DROP_FEATS
+    numerical_feats = NUMERICAL_FEATS + MATCH_STATE_FEATS if match_state else NUMERICAL_FEATS
     
     ct = make_column_transformer(
         (scaler, numerical_feats), 
-        (ohe, categorical_feats),
+        (ohe, CATEGORICAL_FEATS),
         ("drop", drop_feats)
     )
 
     return ct
 
-def build_final_model(ct, X_train, y_train):
+def _used_columns(ct):
+    """ Columns of the input that a (fitted or unfitted) column transformer does not drop """
+    transformers = ct.transformers_ if hasattr(ct, "transformers_") else ct.transformers
+    return [col for _, fitted, cols in transformers
+            if not (isinstance(fitted, str) and fitted == "drop") for col in cols]
+
+
+def _frame_digest(X, columns):
+    """ Hash the values of the given columns of a DataFrame, in row order """
+    digest = hashlib.sha256()
+    digest.update(repr(columns).encode())
+    digest.update(pd.util.hash_pandas_object(X[columns], index=False).to_numpy().tobytes())
+    return digest
+
+
+def _cache_get(cache_dir, key):
+    """ Load a cached (transformer, matrix) entry, or None on a miss """
+    import scipy.sparse as sp
+
+    entry = os.path.join(cache_dir, key)
+    if not os.path.isdir(entry):
+        return None
+    # touch the entry so eviction removes the least recently used ones first
+    os.utime(entry)
+    with open(os.path.join(entry, "transformer.pkl"), 'rb') as f:
+        fitted_ct = pickle.load(f)
+    if os.path.exists(os.path.join(entry, "matrix.npz")):
+        return fitted_ct, sp.load_npz(os.path.join(entry, "matrix.npz"))
+    return fitted_ct, np.load(os.path.join(entry, "matrix.npy"))
+
+
+def _cache_put(cache_dir, key, fitted_ct, matrix, max_cache_bytes):
+    """ Store a (transformer, matrix) entry atomically, then evict old entries over the size limit """
+    import scipy.sparse as sp
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_entry = tempfile.mkdtemp(dir=cache_dir, prefix=".tmp-")
+    with open(os.path.join(tmp_entry, "transformer.pkl"), 'wb') as f:
+        pickle.dump(fitted_ct, f)
+    if sp.issparse(matrix):
+        sp.save_npz(os.path.join(tmp_entry, "matrix.npz"), matrix.tocsr(), compressed=False)
+    else:
+        np.save(os.path.join(tmp_entry, "matrix.npy"), matrix)
+
+    entry = os.path.join(cache_dir, key)
+    if os.path.isdir(entry):
+        shutil.rmtree(tmp_entry)
+    else:
+        os.replace(tmp_entry, entry)
+    _evict(cache_dir, max_cache_bytes)
+
+
+def _evict(cache_dir, max_cache_bytes):
+    """ Remove the least recently used cache entries until the cache fits in max_cache_bytes """
+    entries = []
+    for name in os.listdir(cache_dir):
+        entry = os.path.join(cache_dir, name)
+        if name.startswith(".") or not os.path.isdir(entry):
+            continue
+        size = sum(os.path.getsize(os.path.join(entry, f)) for f in os.listdir(entry))
+        entries.append((os.path.getmtime(entry), size, entry))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, entry in sorted(entries):
+        if total <= max_cache_bytes:
+            break
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+
+
+def encode_features(ct, X, cache_dir, fit=True, max_cache_bytes=MAX_CACHE_BYTES):
+    """ Encode the predictors with a column transformer, caching the encoded design matrix on disk.
+
+    Entries are keyed by a hash of the values of the columns the transformer uses and of the
+    transformer configuration (or, with fit=False, of the fitted transformer), so repeated
+    experiments on the same features skip the encoding. The least recently used entries are
+    evicted once the cache grows beyond max_cache_bytes.
+
+    Parameters
+    ----------
+    ct: ColumnTransformer
+        Column transformer from transformer(), unfitted when fit is True, fitted otherwise
+    
+    X: pd.DataFrame
+        Predictor variables to encode
+
+    cache_dir: str
+        Directory of the cache
+
+    fit: bool
+        Fit the transformer on X (training data) or only transform X with an already fitted transformer
+
+    max_cache_bytes: int
+        Size limit of the cache directory
+    
+    Returns
+    ----------
+    fitted_ct: ColumnTransformer
+        The fitted transformer
+
+    X_encoded: scipy.sparse matrix or np.ndarray
+        The encoded design matrix
+    
+    Example
+    ----------
+    >>> ct = transformer(*preprocessing())
+    >>> fitted_ct, X_train_enc = encode_features(ct, X_train, 'cache/')
+    >>> _, X_test_enc = encode_features(fitted_ct, X_test, 'cache/', fit=False)
+    """
+    digest = _frame_digest(X, _used_columns(ct))
+    if fit:
+        digest.update(b"fit" + repr(sorted(ct.get_params(deep=True).items(), key=lambda item: item[0])).encode())
+    else:
+        digest.update(b"transform" + pickle.dumps(ct))
+    key = digest.hexdigest()
+
+    cached = _cache_get(cache_dir, key)
+    if cached is not None:
+        return cached
+
+    X_encoded = ct.fit_transform(X) if fit else ct.transform(X)
+    _cache_put(cache_dir, key, ct, X_encoded, max_cache_bytes)
+    return ct, X_encoded
+
+
+def build_final_model(ct, X_train, y_train, model=None, cache_dir=None, max_cache_bytes=MAX_CACHE_BYTES):
     """ Combine the model with the transformer in the pipeline, 
     train the pipeline with the training set, and return the trained pipeline.
 
@@ -121,6 +434,16 @@ def build_final_model(ct, X_train, y_train):
     
     y_train: pd.DataFrame
         Testing data for the target variable
+
+    model: estimator, optional
+        Classifier to train, LogisticRegression(class_weight="balanced") by default
+
+    cache_dir: str, optional
+        Directory to cache the encoded training data in, see encode_features. When set, the
+        transformer is only fitted on data and configurations that are not cached yet.
+
+    max_cache_bytes: int
+        Size limit of the cache directory
     
     Results
     ----------
@@ -134,8 +457,17 @@ def build_final_model(ct, X_train, y_train):
     >>> ohe, scaler = preprocessing()
     >>> ct = transformer(ohe, scaler)
     >>> build_final_model(ct, X_train, y_train)
+    >>> build_final_model(ct, X_train, y_train, model=LogisticRegression(C=0.1), cache_dir='cache/')
     """
-    final_model = LogisticRegression(class_weight="balanced", n_jobs=-1)
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+
+    final_model = LogisticRegression(class_weight="balanced", n_jobs=-1) if model is None else model
+
+    if cache_dir is not None:
+        fitted_ct, X_encoded = encode_features(ct, X_train, cache_dir, max_cache_bytes=max_cache_bytes)
+        final_model.fit(X_encoded, y_train)
+        return make_pipeline(fitted_ct, final_model)
 
     final_pipe = make_pipeline(
         ct,
@@ -145,7 +477,289 @@ def build_final_model(ct, X_train, y_train):
 
     return final_pipe
 
-def evaluate_model(final_pipe, X_test, y_test, save_image_path):
+def build_streaming_model(parquet_path, ohe=None, scaler=None, filters=None, batch_size=65536,
+                          n_epochs=5, random_state=123):
+    """ Train the wicket model out of core, streaming parquet record batches instead of
+    materializing the training set.
+
+    A first pass fits the scaler incrementally, collects the categories of the one hot encoded
+    columns and counts the classes. Later passes update an SGDClassifier with logistic loss
+    through partial_fit, weighting the classes like class_weight="balanced" over the whole data.
+
+    Parameters
+    ----------
+    parquet_path: str
+        File path pointing to a parquet file or a directory containing the training data
+    
+    ohe: OneHotEncoder, optional
+        Encoder configuration for the categorical features, preprocessing() by default
+
+    scaler: StandardScaler, optional
+        Scaler for the numerical features, preprocessing() by default
+
+    filters: dict, optional
+        Maps a column to the list of values to train on, for example {'season': ['2016/17']}
+
+    batch_size: int
+        Maximum number of rows held in memory at a time
+
+    n_epochs: int
+        Number of passes over the data to train the classifier with
+
+    random_state: int
+        Random seed of the classifier
+    
+    Results
+    ----------
+    Pipeline
+        Fitted pipeline of a column transformer (dropping nothing, like transformer(ohe, scaler, drop_feats=[]))
+        and the classifier, named "columntransformer" and "sgdclassifier"
+
+    Raises
+    ----------
+    ValueError: If the data is empty or does not contain both classes.
+    
+    Example
+    ----------
+    >>> final_pipe = build_streaming_model('data/train_parquet', batch_size=100000)
+    >>> final_pipe.predict_proba(X_test[MODEL_FEATS])
+    """
+    from sklearn.base import clone
+    from sklearn.linear_model import SGDClassifier
+    from sklearn.pipeline import make_pipeline
+
+    default_ohe, default_scaler = preprocessing()
+    ohe = default_ohe if ohe is None else ohe
+    scaler = default_scaler if scaler is None else scaler
+    columns = MODEL_FEATS + ['wicket']
+
+    def batches():
+        return iter_model_batches(parquet_path, columns=columns, filters=filters, batch_size=batch_size)
+
+    # first pass: scaler statistics, categories and class counts
+    categories = {col: set() for col in CATEGORICAL_FEATS}
+    class_counts = defaultdict(int)
+    for batch in batches():
+        scaler.partial_fit(batch[NUMERICAL_FEATS])
+        for col in CATEGORICAL_FEATS:
+            categories[col].update(batch[col].unique())
+        for label, count in batch['wicket'].value_counts().items():
+            class_counts[label] += count
+
+    classes = np.array(sorted(class_counts))
+    if len(classes) < 2:
+        raise ValueError("Training data must contain both classes of 'wicket'")
+
+    # fit the encoders on a small frame holding every category, then swap in the streamed scaler
+    n_rows = max(len(values) for values in categories.values())
+    sample = pd.DataFrame({col: np.resize(np.array(sorted(categories[col])), n_rows) for col in CATEGORICAL_FEATS})
+    for col in NUMERICAL_FEATS:
+        sample[col] = 0.0
+    ct = transformer(ohe, clone(scaler), drop_feats=[])
+    ct.fit(sample[MODEL_FEATS])
+    ct.transformers_ = [(name, scaler, cols) if name == "standardscaler" else (name, fitted, cols)
+                        for name, fitted, cols in ct.transformers_]
+
+    # class_weight="balanced": n_samples / (n_classes * count of the class)
+    n_samples = sum(class_counts.values())
+    class_weight = {label: n_samples / (len(classes) * class_counts[label]) for label in classes}
+    final_model = SGDClassifier(loss="log_loss", class_weight=class_weight, random_state=random_state)
+
+    # later passes: incremental training
+    for _ in range(n_epochs):
+        for batch in batches():
+            final_model.partial_fit(ct.transform(batch[MODEL_FEATS]), batch['wicket'], classes=classes)
+
+    return make_pipeline(ct, final_model)
+
+# default search space of tune_model
+PARAM_GRID = {'C': [0.01, 0.1, 1.0, 10.0], 'penalty': ['l1', 'l2'], 'class_weight': ['balanced', None]}
+
+# encoded cross-validation folds shared by the candidates evaluated in a worker process
+_FOLDS = None
+
+
+def _init_folds(folds):
+    global _FOLDS
+    _FOLDS = folds
+
+
+def _score_candidate(base_model, params, scoring, fold_index):
+    """ Fit one candidate on one encoded fold and return its validation score and timings """
+    import sklearn.metrics as metrics
+    from sklearn.base import clone
+
+    X_fit, y_fit, X_val, y_val = _FOLDS[fold_index]
+    model = clone(base_model).set_params(**params)
+    start = time.perf_counter()
+    model.fit(X_fit, y_fit)
+    fit_time = time.perf_counter() - start
+    start = time.perf_counter()
+    score = metrics.get_scorer(scoring)(model, X_val, y_val)
+    score_time = time.perf_counter() - start
+    return score, fit_time, score_time
+
+
+def tune_model(X, y, groups=None, param_grid=None, base_model=None, n_splits=5, scoring="roc_auc", n_workers=1):
+    """ Search the hyperparameters of the wicket model with cross-validation grouped by game.
+
+    All deliveries of a game land in the same fold, so no match leaks between training and
+    validation. The transformer is fitted once per fold and the encoded folds are shared by
+    every candidate, which are evaluated across a process pool.
+
+    Parameters
+    ----------
+    X: pd.DataFrame
+        Training data for all the predictor variables
+    
+    y: pd.Series
+        Training data for the target variable
+
+    groups: array-like, optional
+        Group of every delivery, X['game_id'] by default
+
+    param_grid: dict, optional
+        Lists of values to search for each parameter of the model, PARAM_GRID by default
+
+    base_model: estimator, optional
+        Model the parameters are set on, LogisticRegression(solver="liblinear") by default,
+        which supports both the l1 and l2 penalties
+
+    n_splits: int
+        Number of cross-validation folds
+
+    scoring: str
+        Name of an sklearn scorer to rank the candidates by
+
+    n_workers: int
+        Number of worker processes to evaluate the candidates with
+    
+    Returns
+    ----------
+    results: pd.DataFrame
+        One row per candidate with its parameters, mean and standard deviation of the validation
+        score, mean fit and score time per fold and total time, best candidate first
+
+    best_params: dict
+        Parameters of the best candidate
+    
+    Example
+    ----------
+    >>> results, best_params = tune_model(X_train, y_train, n_workers=8)
+    >>> final_model = build_final_model(ct, X_train, y_train, model=LogisticRegression(solver="liblinear", **best_params))
+    """
+    if type(n_workers) != int or n_workers < 1:
+        raise ValueError("n_workers must be a positive integer")
+
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.model_selection import GroupKFold, ParameterGrid
+
+    groups = X['game_id'] if groups is None else groups
+    param_grid = PARAM_GRID if param_grid is None else param_grid
+    base_model = LogisticRegression(solver="liblinear", max_iter=1000) if base_model is None else base_model
+    candidates = list(ParameterGrid(param_grid))
+
+    # fit the preprocessing once per fold
+    folds = []
+    for fit_index, val_index in GroupKFold(n_splits=n_splits).split(X, y, groups):
+        ohe, scaler = preprocessing()
+        ct = transformer(ohe, scaler, drop_feats=[col for col in DROP_FEATS if col in X.columns])
+        X_fit = ct.fit_transform(X.iloc[fit_index])
+        folds.append((X_fit, y.iloc[fit_index].to_numpy(), ct.transform(X.iloc[val_index]),
+                      y.iloc[val_index].to_numpy()))
+
+    tasks = [(candidate, fold) for candidate in range(len(candidates)) for fold in range(n_splits)]
+    args = ([base_model] * len(tasks), [candidates[c] for c, _ in tasks], [scoring] * len(tasks),
+            [fold for _, fold in tasks])
+    if n_workers == 1:
+        _init_folds(folds)
+        outcomes = list(map(_score_candidate, *args))
+        _init_folds(None)
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_folds, initargs=(folds,)) as pool:
+            outcomes = list(pool.map(_score_candidate, *args))
+
+    rows = []
+    for index, params in enumerate(candidates):
+        scores, fit_times, score_times = zip(*outcomes[index * n_splits:(index + 1) * n_splits])
+        rows.append({**{f"param_{name}": value for name, value in params.items()},
+                     "mean_score": np.mean(scores), "std_score": np.std(scores),
+                     "mean_fit_time": np.mean(fit_times), "mean_score_time": np.mean(score_times),
+                     "total_time": np.sum(fit_times) + np.sum(score_times)})
+        print(f"{params}: {scoring} {np.mean(scores):.4f} in {rows[-1]['total_time']:.3f}s")
+
+    results = pd.DataFrame(rows).sort_values("mean_score", ascending=False, kind="stable")
+    best_params = candidates[results.index[0]]
+    return results.reset_index(drop=True), best_params
+
+def evaluate_predictions(final_pipe, X_test, y_test, n_bins=10):
+    """ Evaluate the model from a single inference pass over the testing set.
+
+    Rows of X_test with missing values are dropped together with their targets. The wicket
+    probabilities are predicted once and every metric is derived from them.
+
+    Parameters
+    ----------
+    final_pipe: Pipeline or CompiledPredictor
+        Fitted pipeline, or anything else with a predict_proba method
+    
+    X_test: pd.DataFrame
+        Testing data for all the predictor variables
+    
+    y_test: pd.DataFrame
+        Testing data for the target variable
+
+    n_bins: int
+        Number of equal-width probability bins of the calibration table
+    
+    Results
+    ----------
+    dict
+        accuracy (float), confusion_matrix (numpy array), roc_auc (float, nan if y_test has one class),
+        log_loss (float), calibration (pd.DataFrame of count, mean predicted probability and observed
+        wicket rate per bin), and per_over / per_season (pd.DataFrame of count, wicket rate, mean predicted
+        probability and accuracy, when X_test has the over / season column)
+    
+    Example
+    ----------
+    >>> results = evaluate_predictions(final_model, X_test, y_test)
+    >>> results['per_over']
+    """
+    import sklearn.metrics as metrics
+
+    keep = X_test.notna().all(axis=1).to_numpy()
+    X_test = X_test[keep]
+    y_true = np.asarray(y_test)[keep]
+
+    classes = getattr(final_pipe, 'classes_', np.array([0, 1]))
+    proba = final_pipe.predict_proba(X_test)
+    y_pred = classes[proba.argmax(axis=1)]
+    p_wicket = proba[:, 1]
+
+    results = {
+        "accuracy": float(np.mean(y_pred == y_true)),
+        "confusion_matrix": metrics.confusion_matrix(y_true, y_pred, labels=classes),
+        "roc_auc": metrics.roc_auc_score(y_true, p_wicket) if len(np.unique(y_true)) > 1 else np.nan,
+        "log_loss": metrics.log_loss(y_true, proba, labels=classes),
+    }
+
+    bins = np.minimum((p_wicket * n_bins).astype(int), n_bins - 1)
+    calibration = pd.DataFrame({"bin": bins, "predicted": p_wicket, "observed": y_true})
+    calibration = calibration.groupby("bin").agg(count=("observed", "size"), mean_predicted=("predicted", "mean"),
+                                                 observed_rate=("observed", "mean"))
+    calibration.index = [f"{b / n_bins:.2f}-{(b + 1) / n_bins:.2f}" for b in calibration.index]
+    results["calibration"] = calibration
+
+    outcomes = pd.DataFrame({"wicket": y_true, "predicted": p_wicket, "correct": y_pred == y_true})
+    for col in ["over", "season"]:
+        if col in X_test.columns:
+            results[f"per_{col}"] = outcomes.groupby(X_test[col].to_numpy()).agg(
+                count=("wicket", "size"), wicket_rate=("wicket", "mean"),
+                mean_predicted=("predicted", "mean"), accuracy=("correct", "mean"))
+
+    return results
+
+def evaluate_model(final_pipe, X_test, y_test, save_image_path=None, plot=True):
     """ Evaluate the model by generating the test score of the final pipeline. 
     Additionally, create the confusion matrix of the model and save it to the specified input path.
 
@@ -162,6 +776,10 @@ def evaluate_model(final_pipe, X_test, y_test, save_image_path):
     
     save_image_path: str
         File path for where the confusion matrix should be saved
+
+    plot: bool
+        Plot and save the confusion matrix. With plot=False matplotlib is never imported,
+        for headless batch runs.
     
     Results
     ----------
@@ -172,7 +790,7 @@ def evaluate_model(final_pipe, X_test, y_test, save_image_path):
         Returns the confusion matrix results on the testing set
     
     plot_cm: ConfusionMatrixDisplay
-        Returns a graph of the confusion matrix
+        Returns a graph of the confusion matrix, None when plot is False
     
     Example
     ----------
@@ -183,15 +801,25 @@ def evaluate_model(final_pipe, X_test, y_test, save_image_path):
     >>> ct = transformer(ohe, scaler)
     >>> final_model = build_final_model(ct, X_train, y_train)
     >>> evaluate_model(final_model, X_test, y_test, 'images/')
+    >>> evaluate_model(final_model, X_test, y_test, plot=False)
 
     """
-    X_test = X_test.dropna()
-    score = final_pipe.score(X_test, y_test)
-    conf_mat = metrics.confusion_matrix(y_test, final_pipe.predict(X_test))
-    plot_cm = metrics.ConfusionMatrixDisplay(conf_mat)
-    plot_cm.plot()
-    plt.savefig(os.path.join(save_image_path, "chart7.png"))
+    results = evaluate_predictions(final_pipe, X_test, y_test)
+    score = results["accuracy"]
+    conf_mat = results["confusion_matrix"]
     print(f"Model Score: {score}")
-    print(f"Chart saved to: {save_image_path}")
+
+    plot_cm = None
+    if plot:
+        if save_image_path is None:
+            raise ValueError("save_image_path is required to plot the confusion matrix")
+        import matplotlib.pyplot as plt
+        import sklearn.metrics as metrics
+
+        plot_cm = metrics.ConfusionMatrixDisplay(conf_mat)
+        plot_cm.plot()
+        plt.savefig(os.path.join(save_image_path, "chart7.png"))
+        plt.close(plot_cm.figure_)
+        print(f"Chart saved to: {save_image_path}")
 
     return score, conf_mat, plot_cm
@@ -0,0 +1,255 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# delivery columns the per-game player totals are computed from
+DELIVERY_STATS_COLUMNS = ['game_id', 'date', 'batter_id', 'bowler_id', 'player_out_id', 'wicket', 'wicket_type',
+                          'runs_batter', 'runs_total', 'wides', 'noballs', 'legbyes', 'byes']
+
+# per-game totals of a player kept in the store, and summed into career_<stat> columns
+GAME_STATS = ['games', 'bat_balls', 'bat_runs', 'dismissals', 'bowl_balls', 'bowl_runs', 'bowl_wickets']
+
+# Cricsheet wicket kinds that are not credited to the bowler
+NON_BOWLER_WICKETS = ['run out', 'retired hurt', 'retired not out', 'retired out', 'obstructing the field',
+                     'hit the ball twice', 'handled the ball', 'timed out']
+
+# wicket kinds where the batter leaves without being out, not counted as dismissals
+RETIRED_WICKETS = ['retired hurt', 'retired not out']
+
+# columns join_career_stats adds for the batter and the bowler of a delivery
+BATTER_CAREER_FEATS = ['batter_career_games', 'batter_career_balls', 'batter_career_runs',
+                       'batter_career_dismissals', 'batter_dismissal_rate']
+BOWLER_CAREER_FEATS = ['bowler_career_games', 'bowler_career_balls', 'bowler_career_runs',
+                       'bowler_career_wickets', 'bowler_strike_rate']
+
+
+def game_player_stats(df):
+    """ Total the batting and bowling of every player in every game of a dataframe of deliveries
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Deliveries with the DELIVERY_STATS_COLUMNS, from any number of games
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per player and game with player_id, game_id, date (datetime64) and the GAME_STATS.
+        Retirements in RETIRED_WICKETS are not dismissals, and only wickets outside NON_BOWLER_WICKETS
+        count as bowl_wickets. Players without a cricsheet id are skipped.
+
+    Examples
+    --------
+    >>> game_player_stats(pd.read_parquet('data/t20s_parquet/211028.parquet'))
+
+    """
+    if any(col not in df.columns for col in DELIVERY_STATS_COLUMNS):
+        raise KeyError("Columns are missing")
+
+    wicket = df['wicket'].to_numpy() == 1
+    dismissed = wicket & ~df['wicket_type'].isin(RETIRED_WICKETS).to_numpy()
+    # wides are not a ball faced, neither wides nor no-balls are a legal ball of the over
+    faced = df['wides'].to_numpy() == 0
+    legal = faced & (df['noballs'].to_numpy() == 0)
+    stats = pd.DataFrame({
+        'game_id': df['game_id'].astype(str).to_numpy(),
+        'bat_balls': faced.astype('int64'),
+        'bat_runs': df['runs_batter'].to_numpy(),
+        'dismissals': 1,
+        'bowl_balls': legal.astype('int64'),
+        'bowl_runs': (df['runs_total'] - df['legbyes'] - df['byes']).to_numpy(),
+        'bowl_wickets': (wicket & ~df['wicket_type'].isin(NON_BOWLER_WICKETS).to_numpy()).astype('int64'),
+    })
+
+    batting = stats[['bat_balls', 'bat_runs']].groupby(
+        [stats['game_id'], df['batter_id'].astype(str).to_numpy()]).sum()
+    dismissals = stats.loc[dismissed, ['dismissals']].groupby(
+        [stats['game_id'][dismissed], df['player_out_id'].astype(str).to_numpy()[dismissed]]).sum()
+    bowling = stats[['bowl_balls', 'bowl_runs', 'bowl_wickets']].groupby(
+        [stats['game_id'], df['bowler_id'].astype(str).to_numpy()]).sum()
+
+    totals = pd.concat([batting, dismissals, bowling], axis=1).fillna(0).astype('int64')
+    totals.index.names = ['game_id', 'player_id']
+    totals = totals.reset_index()
+    totals = totals[~totals['player_id'].isin(['', 'Unknown', 'nan'])]
+    totals['games'] = 1
+
+    dates = pd.Series(pd.to_datetime(df['date'].astype(str)).to_numpy(), index=stats['game_id']).groupby(level=0).first()
+    totals.insert(2, 'date', totals['game_id'].map(dates))
+    return totals[['player_id', 'game_id', 'date'] + GAME_STATS].reset_index(drop=True)
+
+
+def _with_careers(games):
+    """ Sort per-game rows by player and game order and add the career_<stat> totals through each game """
+    games = games.sort_values(['player_id', 'date', 'game_id'], ignore_index=True)
+    careers = games.groupby('player_id', sort=False)[GAME_STATS].cumsum()
+    careers.columns = [f"career_{stat}" for stat in GAME_STATS]
+    return pd.concat([games[['player_id', 'game_id', 'date'] + GAME_STATS], careers], axis=1)
+
+
+def _read_deliveries(parquet_path, exclude_games=None):
+    """ Read the DELIVERY_STATS_COLUMNS of a parquet file or directory, skipping the excluded game ids """
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(parquet_path, format="parquet", partitioning="hive")
+    expression = None
+    if exclude_games:
+        expression = ~ds.field('game_id').cast(pa.string()).isin(list(exclude_games))
+    return dataset.to_table(columns=DELIVERY_STATS_COLUMNS, filter=expression).to_pandas()
+
+
+def build_career_stats(parquet_path):
+    """ Build the player career statistics store from wrangled deliveries
+
+    The store has one row per player and game, in (player_id, date, game_id) order, with the
+    player's totals in the game (GAME_STATS) and through the game (career_<stat>). It is the
+    index join_career_stats looks up point-in-time career statistics in.
+
+    Parameters
+    ----------
+    parquet_path : str
+        Parquet file or directory of deliveries, e.g. the output of process_cricket_jsons
+        or apply_dtypes_and_write
+
+    Returns
+    -------
+    pd.DataFrame
+        The career statistics store
+
+    Examples
+    --------
+    >>> store = build_career_stats('data/cricket_main.parquet')
+
+    """
+    return _with_careers(game_player_stats(_read_deliveries(parquet_path)))
+
+
+def read_career_stats(store_path):
+    """ Read a career statistics store written by update_career_stats
+
+    Parameters
+    ----------
+    store_path : str
+        Parquet file of the store
+
+    Returns
+    -------
+    pd.DataFrame
+        The career statistics store
+
+    Examples
+    --------
+    >>> read_career_stats('data/career_stats.parquet')
+
+    """
+    return pq.read_table(store_path).to_pandas()
+
+
+def update_career_stats(store_path, parquet_path):
+    """ Add the games of wrangled deliveries that are not in the store yet, and save the store
+
+    Only the deliveries of new games are read and totalled. The career totals are then recomputed
+    from the per-game rows, so games dated before the ones already stored are placed correctly.
+    Games already in the store are not read again; rebuild the store to pick up changed games.
+
+    Parameters
+    ----------
+    store_path : str
+        Parquet file of the store, created if it does not exist
+
+    parquet_path : str
+        Parquet file or directory of deliveries
+
+    Returns
+    -------
+    pd.DataFrame
+        The updated career statistics store
+
+    Examples
+    --------
+    >>> process_cricket_jsons('data/t20s_json.zip', 'data/t20s_parquet', incremental=True)
+    >>> update_career_stats('data/career_stats.parquet', 'data/t20s_parquet')
+
+    """
+    store = read_career_stats(store_path) if os.path.exists(store_path) else None
+    known_games = set() if store is None else set(store['game_id'])
+
+    new_games = game_player_stats(_read_deliveries(parquet_path, exclude_games=known_games))
+    print(f"{new_games['game_id'].nunique()} new games added to the career statistics store")
+    if store is not None:
+        if new_games.empty:
+            return store
+        new_games = pd.concat([store[['player_id', 'game_id', 'date'] + GAME_STATS], new_games], ignore_index=True)
+    store = _with_careers(new_games)
+
+    # write next to the store first, so a failed update leaves the previous store intact
+    tmp_path = store_path + ".tmp"
+    pq.write_table(pa.Table.from_pandas(store, preserve_index=False), tmp_path)
+    os.replace(tmp_path, store_path)
+    return store
+
+
+def join_career_stats(df, store):
+    """ Add the career statistics of the batter and bowler of every delivery, as of the start of its game
+
+    Each delivery is matched with the player's latest game in the store dated strictly before the
+    delivery's game (an as-of join), so the statistics never include the game itself, later games
+    or games played on the same day. Players without an earlier game get 0 totals and NaN rates.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+        Deliveries with the date, batter_id and bowler_id columns
+
+    store : pd.DataFrame
+        Career statistics store from build_career_stats, update_career_stats or read_career_stats
+
+    Returns
+    -------
+    pd.DataFrame
+        df, in the same row order, with the BATTER_CAREER_FEATS and BOWLER_CAREER_FEATS columns added.
+        batter_dismissal_rate is dismissals per ball faced, bowler_strike_rate balls bowled per wicket.
+
+    Examples
+    --------
+    >>> store = read_career_stats('data/career_stats.parquet')
+    >>> join_career_stats(pd.read_parquet('data/cricket_main.parquet'), store)
+
+    """
+    if 'date' not in df.columns or 'batter_id' not in df.columns or 'bowler_id' not in df.columns:
+        raise KeyError("Columns are missing")
+
+    # merge_asof needs both sides sorted by date
+    dates = pd.to_datetime(df['date'].astype(str)).to_numpy()
+    order = np.argsort(dates, kind='stable')
+    left = pd.DataFrame({'date': dates[order], 'batter_id': df['batter_id'].astype(str).to_numpy()[order],
+                         'bowler_id': df['bowler_id'].astype(str).to_numpy()[order]})
+    right = store.sort_values(['date', 'player_id', 'game_id'], kind='stable')
+
+    features = {}
+    for role, stats in [('batter', ['games', 'bat_balls', 'bat_runs', 'dismissals']),
+                        ('bowler', ['games', 'bowl_balls', 'bowl_runs', 'bowl_wickets'])]:
+        careers = right[['date', 'player_id'] + [f"career_{stat}" for stat in stats]].rename(
+            columns={'player_id': f"{role}_id"})
+        matched = pd.merge_asof(left[['date', f"{role}_id"]], careers, on='date', by=f"{role}_id",
+                                allow_exact_matches=False)
+        values = matched[[f"career_{stat}" for stat in stats]].fillna(0).astype('int64').to_numpy()
+        features[role] = np.empty_like(values)
+        features[role][order] = values
+
+    games, balls, runs, dismissals = features['batter'].T
+    df['batter_career_games'] = games
+    df['batter_career_balls'] = balls
+    df['batter_career_runs'] = runs
+    df['batter_career_dismissals'] = dismissals
+    df['batter_dismissal_rate'] = np.divide(dismissals, balls, out=np.full(len(df), np.nan), where=balls > 0)
+
+    games, balls, runs, wickets = features['bowler'].T
+    df['bowler_career_games'] = games
+    df['bowler_career_balls'] = balls
+    df['bowler_career_runs'] = runs
+    df['bowler_career_wickets'] = wickets
+    df['bowler_strike_rate'] = np.divide(balls, wickets, out=np.full(len(df), np.nan), where=wickets > 0)
+    return df
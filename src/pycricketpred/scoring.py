@@ -0,0 +1,424 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# version of the saved model artifact layout, see save_model
+ARTIFACT_VERSION = 1
+
+# identifying columns copied from the deliveries to the predictions written by score_archive
+ID_COLUMNS = ['game_id', 'inning', 'over', 'over_ball']
+
+
+def _expit(z):
+    """ Numerically stable logistic function """
+    return np.exp(-np.logaddexp(0, -z))
+
+
+class CompiledPredictor:
+    """ Wicket probability scorer compiled from a fitted pipeline into plain NumPy arrays.
+
+    Scores a delivery as intercept + sum of (x - mean) / scale * coef over the numerical features
+    + the coefficient of each categorical feature's one hot column. Dropped and unknown
+    categories contribute nothing, like OneHotEncoder(drop="if_binary", handle_unknown="ignore").
+
+    Parameters
+    ----------
+    numerical_feats: list(str)
+        Names of the scaled numerical features
+
+    mean: np.ndarray
+        Mean of each numerical feature
+
+    scale: np.ndarray
+        Scale of each numerical feature
+
+    numerical_coef: np.ndarray
+        Model coefficient of each numerical feature
+
+    categorical_feats: list(str)
+        Names of the one hot encoded features
+
+    categories: list(np.ndarray)
+        Sorted categories of each categorical feature
+
+    category_coef: list(np.ndarray)
+        Model coefficient of each category, 0 for dropped categories
+
+    intercept: float
+        Model intercept
+
+    metadata: dict, optional
+        Information about the model, filled in by save_model / load_model
+
+    Example
+    ----------
+    >>> predictor = CompiledPredictor.from_pipeline(final_pipe)
+    >>> predictor.predict_one({'runs_cumulative': 54, 'inning': 2, 'over': 7, 'powerplay': 0, 'over_ball': 3})
+    """
+
+    def __init__(self, numerical_feats, mean, scale, numerical_coef, categorical_feats, categories,
+                 category_coef, intercept, metadata=None):
+        self.numerical_feats = list(numerical_feats)
+        self.mean = np.asarray(mean, dtype=float)
+        self.scale = np.asarray(scale, dtype=float)
+        self.numerical_coef = np.asarray(numerical_coef, dtype=float)
+        self.categorical_feats = list(categorical_feats)
+        self.categories = [np.asarray(values) for values in categories]
+        self.category_coef = [np.asarray(coef, dtype=float) for coef in category_coef]
+        self.intercept = float(intercept)
+        self.metadata = dict(metadata or {})
+
+        # fold the scaling into the coefficients: coef * (x - mean) / scale = x * weight + offset
+        self._weights = self.numerical_coef / self.scale
+        self._bias = self.intercept - float(np.sum(self.mean * self._weights))
+        self._lookups = [dict(zip(values.tolist(), coef.tolist()))
+                         for values, coef in zip(self.categories, self.category_coef)]
+
+    @property
+    def features(self):
+        """ Feature order expected for NumPy rows: the numerical features, then the categorical ones """
+        return self.numerical_feats + self.categorical_feats
+
+    @classmethod
+    def from_pipeline(cls, final_pipe):
+        """ Extract the scaler statistics, one hot categories and logistic coefficients of a fitted pipeline.
+
+        Parameters
+        ----------
+        final_pipe: Pipeline
+            Fitted pipeline of a column transformer with a StandardScaler, a OneHotEncoder and drops,
+            followed by a binary linear classifier with logistic loss, as returned by build_final_model
+            or build_streaming_model
+
+        Returns
+        ----------
+        CompiledPredictor
+            Predictor matching final_pipe.predict_proba
+
+        Raises
+        ----------
+        ValueError: If the pipeline has other steps or transformers.
+        """
+        from sklearn.preprocessing import StandardScaler, OneHotEncoder
+
+        ct = final_pipe.steps[0][1]
+        model = final_pipe.steps[-1][1]
+        if len(final_pipe.steps) != 2 or model.coef_.shape[0] != 1:
+            raise ValueError("Pipeline must be a column transformer followed by a binary linear classifier")
+
+        coef = model.coef_[0]
+        position = 0
+        numerical_feats, mean, scale, numerical_coef = [], [], [], []
+        categorical_feats, categories, category_coef = [], [], []
+
+        for name, fitted, cols in ct.transformers_:
+            if isinstance(fitted, str) and fitted == "drop" or len(cols) == 0:
+                continue
+            if isinstance(fitted, StandardScaler):
+                n = len(cols)
+                numerical_feats += list(cols)
+                mean += list(fitted.mean_) if fitted.mean_ is not None and fitted.with_mean else [0.0] * n
+                scale += list(fitted.scale_) if fitted.scale_ is not None and fitted.with_std else [1.0] * n
+                numerical_coef += list(coef[position:position + n])
+                position += n
+            elif isinstance(fitted, OneHotEncoder):
+                if fitted.handle_unknown != "ignore":
+                    raise ValueError("OneHotEncoder must use handle_unknown='ignore'")
+                drop_idx = fitted.drop_idx_ if fitted.drop_idx_ is not None else [None] * len(cols)
+                for col, values, dropped in zip(cols, fitted.categories_, drop_idx):
+                    weights = np.zeros(len(values))
+                    kept = np.array([i for i in range(len(values)) if dropped is None or i != dropped], dtype=int)
+                    weights[kept] = coef[position:position + len(kept)]
+                    position += len(kept)
+                    categorical_feats.append(col)
+                    categories.append(np.asarray(values))
+                    category_coef.append(weights)
+            else:
+                raise ValueError(f"Unsupported transformer {name}")
+
+        if position != len(coef):
+            raise ValueError("Pipeline features do not match the model coefficients")
+
+        return cls(numerical_feats, mean, scale, numerical_coef, categorical_feats, categories,
+                   category_coef, model.intercept_[0], metadata={"model": type(model).__name__})
+
+    def _columns(self, X):
+        """ Split a DataFrame, dict of columns or 2D array into per-feature arrays """
+        if isinstance(X, pd.DataFrame):
+            return [X[col].to_numpy() for col in self.features]
+        elif isinstance(X, dict):
+            return [np.atleast_1d(np.asarray(X[col])) for col in self.features]
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != len(self.features):
+            raise ValueError(f"Rows must have {len(self.features)} values ordered as {self.features}")
+        return [X[:, i] for i in range(X.shape[1])]
+
+    def decision_function(self, X):
+        """ Logit of the wicket probability for a batch of deliveries.
+
+        Parameters
+        ----------
+        X: pd.DataFrame, dict or np.ndarray
+            Deliveries as a DataFrame, a dict of feature values / arrays, or rows ordered as features
+
+        Returns
+        ----------
+        np.ndarray
+            Logit of each delivery
+        """
+        columns = self._columns(X)
+        n_numerical = len(self.numerical_feats)
+        z = np.full(len(columns[0]), self._bias)
+        for values, weight in zip(columns[:n_numerical], self._weights):
+            z += values.astype(float) * weight
+        for values, categories, coef in zip(columns[n_numerical:], self.categories, self.category_coef):
+            # categories_ are sorted, unknown values contribute nothing
+            index = np.searchsorted(categories, values).clip(0, len(categories) - 1)
+            z += np.where(categories[index] == values, coef[index], 0.0)
+        return z
+
+    def predict_proba(self, X):
+        """ Class probabilities for a batch of deliveries, like Pipeline.predict_proba.
+
+        Parameters
+        ----------
+        X: pd.DataFrame, dict or np.ndarray
+            Deliveries as a DataFrame, a dict of feature values / arrays, or rows ordered as features
+
+        Returns
+        ----------
+        np.ndarray
+            Array of shape (n, 2) with the probabilities of no wicket and wicket
+        """
+        p = _expit(self.decision_function(X))
+        return np.column_stack([1 - p, p])
+
+    def predict_one(self, row):
+        """ Wicket probability of a single delivery, without any array overhead.
+
+        Parameters
+        ----------
+        row: dict
+            Feature values of the delivery
+
+        Returns
+        ----------
+        float
+            Probability of a wicket
+        """
+        z = self._bias
+        for col, weight in zip(self.numerical_feats, self._weights):
+            z += row[col] * weight
+        for col, lookup in zip(self.categorical_feats, self._lookups):
+            z += lookup.get(row[col], 0.0)
+        return float(_expit(z))
+
+
+def compile_predictor(final_pipe):
+    """ Compile a fitted pipeline into a CompiledPredictor that scores with pure NumPy.
+
+    Parameters
+    ----------
+    final_pipe: Pipeline
+        Fitted pipeline returned by build_final_model or build_streaming_model
+
+    Returns
+    ----------
+    CompiledPredictor
+        Predictor matching final_pipe.predict_proba to floating point tolerance
+
+    Example
+    ----------
+    >>> from pycricketpred.modelling import build_final_model
+    >>> final_pipe = build_final_model(ct, X_train, y_train)
+    >>> predictor = compile_predictor(final_pipe)
+    >>> predictor.predict_proba(X_test)
+    """
+    return CompiledPredictor.from_pipeline(final_pipe)
+
+
+def save_model(final_pipe, path, training_data=None):
+    """ Save a fitted pipeline as a compact NumPy artifact that loads in milliseconds.
+
+    Only the arrays of the compiled predictor and a JSON metadata record are stored, in one
+    uncompressed .npz file, instead of pickling the sklearn object graph.
+
+    Parameters
+    ----------
+    final_pipe: Pipeline or CompiledPredictor
+        Fitted pipeline returned by build_final_model or build_streaming_model, or its compiled predictor
+
+    path: str
+        File path to save the artifact to, conventionally ending in .npz
+
+    training_data: str, optional
+        Parquet file or directory the model was trained on. Its data_fingerprint is recorded in the metadata.
+
+    Returns
+    ----------
+    dict
+        The metadata saved with the model: artifact version, package version, model class,
+        feature lists, category maps and training data fingerprint
+
+    Example
+    ----------
+    >>> save_model(final_pipe, 'models/wicket.npz', training_data='data/cricket_main.parquet')
+    """
+    from pycricketpred import __version__
+    from pycricketpred.data_wrangling import data_fingerprint
+
+    predictor = final_pipe if isinstance(final_pipe, CompiledPredictor) else compile_predictor(final_pipe)
+    metadata = {
+        "artifact_version": ARTIFACT_VERSION,
+        "package_version": __version__,
+        "model": predictor.metadata.get("model"),
+        "numerical_feats": predictor.numerical_feats,
+        "categorical_feats": predictor.categorical_feats,
+        "categories": {col: values.tolist() for col, values in zip(predictor.categorical_feats, predictor.categories)},
+        "training_data_fingerprint": data_fingerprint(training_data) if training_data is not None
+                                     else predictor.metadata.get("training_data_fingerprint"),
+    }
+
+    arrays = {
+        "metadata": np.array(json.dumps(metadata)),
+        "mean": predictor.mean,
+        "scale": predictor.scale,
+        "numerical_coef": predictor.numerical_coef,
+        "intercept": np.array(predictor.intercept),
+    }
+    for i, (values, coef) in enumerate(zip(predictor.categories, predictor.category_coef)):
+        # plain (non-object) arrays, so loading never needs pickle
+        arrays[f"categories_{i}"] = values.astype(str) if values.dtype == object else values
+        arrays[f"category_coef_{i}"] = coef
+
+    with open(path, 'wb') as f:
+        np.savez(f, **arrays)
+    return metadata
+
+
+def load_model(path):
+    """ Load a model artifact written by save_model.
+
+    Parameters
+    ----------
+    path: str
+        File path of the artifact
+
+    Returns
+    ----------
+    CompiledPredictor
+        Predictor with the saved metadata in its metadata attribute
+
+    Raises
+    ----------
+    ValueError: If the artifact was written by an incompatible version.
+
+    Example
+    ----------
+    >>> predictor = load_model('models/wicket.npz')
+    >>> predictor.metadata['training_data_fingerprint']
+    """
+    with np.load(path, allow_pickle=False) as arrays:
+        metadata = json.loads(str(arrays["metadata"]))
+        if metadata.get("artifact_version") != ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported model artifact version {metadata.get('artifact_version')}")
+        n_categorical = len(metadata["categorical_feats"])
+        return CompiledPredictor(
+            metadata["numerical_feats"], arrays["mean"], arrays["scale"], arrays["numerical_coef"],
+            metadata["categorical_feats"],
+            [arrays[f"categories_{i}"] for i in range(n_categorical)],
+            [arrays[f"category_coef_{i}"] for i in range(n_categorical)],
+            arrays["intercept"], metadata=metadata
+        )
+
+
+def _score_file(predictor, input_path, output_path, batch_size):
+    """ Score one parquet file batch by batch, appending the predictions to output_path """
+    columns = list(dict.fromkeys(ID_COLUMNS + predictor.features))
+    n_rows = 0
+    writer = None
+    try:
+        for batch in pq.ParquetFile(input_path).iter_batches(batch_size=batch_size, columns=columns):
+            df = batch.to_pandas()
+            predictions = pa.table({
+                'game_id': pa.array(df['game_id'].astype(str), pa.string()),
+                'inning': pa.array(df['inning'], pa.int64()),
+                'over': pa.array(df['over'], pa.int64()),
+                'over_ball': pa.array(df['over_ball'], pa.int64()),
+                'wicket_probability': pa.array(predictor.predict_proba(df)[:, 1], pa.float64()),
+            })
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, predictions.schema)
+            writer.write_table(predictions)
+            n_rows += len(df)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n_rows
+
+
+def score_archive(model, parquet_path, output_folder, batch_size=65536, n_workers=1):
+    """ Score every delivery of a parquet archive and write the wicket probabilities to parquet.
+
+    Files are streamed in record batches of at most batch_size rows, so memory stays bounded
+    however large the archive is. Each input file gets an output file at the same relative path
+    with the columns game_id, inning, over, over_ball and wicket_probability.
+
+    Parameters
+    ----------
+    model: Pipeline, CompiledPredictor or str
+        Fitted pipeline (compiled with compile_predictor before scoring), compiled predictor,
+        or file path of a model saved with save_model
+
+    parquet_path: str
+        Parquet file or directory of parquet files with the deliveries to score
+
+    output_folder: str
+        Directory to write the predictions to
+
+    batch_size: int
+        Maximum number of deliveries scored at a time in a process
+
+    n_workers: int
+        Number of worker processes scoring files in parallel
+
+    Returns
+    ----------
+    int
+        Number of deliveries scored
+
+    Example
+    ----------
+    >>> score_archive('models/wicket.npz', 'data/t20s_parquet', 'data/t20s_predictions', n_workers=8)
+    """
+    from pycricketpred.data_wrangling import parquet_data_files
+
+    if type(n_workers) != int or n_workers < 1:
+        raise ValueError("n_workers must be a positive integer")
+
+    if isinstance(model, str):
+        predictor = load_model(model)
+    elif isinstance(model, CompiledPredictor):
+        predictor = model
+    else:
+        predictor = compile_predictor(model)
+
+    input_files = parquet_data_files(parquet_path)
+    output_files = []
+    for input_path in input_files:
+        relative = os.path.basename(input_path) if input_path == parquet_path else os.path.relpath(input_path, parquet_path)
+        output_path = os.path.join(output_folder, relative)
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        output_files.append(output_path)
+
+    args = ([predictor] * len(input_files), input_files, output_files, [batch_size] * len(input_files))
+    if n_workers == 1 or len(input_files) <= 1:
+        return sum(map(_score_file, *args))
+    with ProcessPoolExecutor(max_workers=n_workers) as pool:
+        return sum(pool.map(_score_file, *args))
@@ -0,0 +1,28 @@
+import pytest
+import helpers_data_wrangling
+from pycricketpred.data_wrangling import process_cricket_jsons, determine_majority_dtypes, apply_dtypes_and_write
+
+# build outputs are written to pytest's temporary directories, never into tests/data
+
+
+@pytest.fixture(scope="session")
+def hdw(tmp_path_factory):
+    """ Outputs of the data wrangling functions on the sample zipped folders """
+    return helpers_data_wrangling.build(str(tmp_path_factory.mktemp("data_wrangling")))
+
+
+@pytest.fixture(scope="session")
+def games_folder(tmp_path_factory):
+    """ Per-game parquet files of the sample zipped folder """
+    folder = str(tmp_path_factory.mktemp("test_parquet_modelling"))
+    process_cricket_jsons('tests/data/test_zips.zip', folder)
+    return folder
+
+
+@pytest.fixture(scope="session")
+def cricket_main(games_folder, tmp_path_factory):
+    """ The combined parquet file the modelling tests read, built from the sample zipped folder """
+    path = str(tmp_path_factory.mktemp("modelling") / "cricket_main.parquet")
+    majority = determine_majority_dtypes(helpers_data_wrangling.GAME_FILES, games_folder)
+    apply_dtypes_and_write(helpers_data_wrangling.GAME_FILES, games_folder, majority, path)
+    return path
@@ -5,6 +5,7 @@ import pyarrow
 import zipfile
 import sys
 from collections import defaultdict
+from types import SimpleNamespace
 from pycricketpred.data_wrangling import *
 
 # sample dataframes
@@ -31,16 +32,41 @@ with open('tests/data/211028.json', 'r') as file:
     jsontest = parse_cricket_json(file, '211028')
     jsontest = add_columns(jsontest)
 
-# sample zipped folder
-process_cricket_jsons('tests/data/test_zips.zip', 'tests/data/test_parquet')
-process_cricket_jsons('tests/data/test_zip_empty.zip', 'tests/data/test_parquet_empty')
+GAME_FILES = ['211028.parquet', '211048.parquet', '222678.parquet']
 
-# sample to determine majority types
-majority1 = determine_majority_dtypes(['211028.parquet', '211048.parquet', '222678.parquet'],
-                                       'tests/data/test_parquet')
-majority2 = determine_majority_dtypes([], 'tests/data/test_parquet_empty')
 
-# sample concatenated output
-concat1 = apply_dtypes_and_concatenate(['211028.parquet', '211048.parquet', '222678.parquet'],
-                                       'tests/data/test_parquet', majority1)
-concat2 = apply_dtypes_and_concatenate([], 'tests/data/test_parquet_empty', majority1)
\ No newline at end of file
+def build(folder):
+    """ Convert the sample zipped folders into folder and compute the outputs the tests compare against """
+    out = SimpleNamespace(data=data, data_missing_cols=data_missing_cols, data1=data1, cols=cols, jsontest=jsontest)
+    for name in ['test_parquet', 'test_parquet_empty', 'test_parquet_parallel', 'test_dataset',
+                 'test_parquet_categorical', 'test_streamed']:
+        setattr(out, name, os.path.join(folder, name))
+
+    # sample zipped folder
+    process_cricket_jsons('tests/data/test_zips.zip', out.test_parquet)
+    process_cricket_jsons('tests/data/test_zip_empty.zip', out.test_parquet_empty)
+    process_cricket_jsons('tests/data/test_zips.zip', out.test_parquet_parallel, n_workers=2)
+    process_cricket_jsons('tests/data/test_zips.zip', out.test_dataset, output_format="dataset")
+
+    process_cricket_jsons('tests/data/test_zips.zip', out.test_parquet_categorical, categorical=True)
+
+    # sample to determine majority types
+    out.majority1 = determine_majority_dtypes(GAME_FILES, out.test_parquet)
+    out.majority2 = determine_majority_dtypes([], out.test_parquet_empty)
+    out.majority3 = determine_majority_dtypes(GAME_FILES, out.test_parquet, metadata_only=True)
+
+    # sample concatenated output
+    out.concat1 = apply_dtypes_and_concatenate(GAME_FILES, out.test_parquet, out.majority1)
+    out.concat2 = apply_dtypes_and_concatenate([], out.test_parquet_empty, out.majority1)
+
+    # sample streamed output
+    out.streamed_rows = apply_dtypes_and_write(GAME_FILES, out.test_parquet, out.majority1,
+                                               os.path.join(out.test_streamed, 'cricket_main.parquet'),
+                                               row_group_size=500)
+    out.batches = list(iter_dtype_batches(GAME_FILES, out.test_parquet, out.majority1, batch_size=100))
+
+    # sample categorical output
+    out.majority_categorical = determine_majority_dtypes(GAME_FILES, out.test_parquet_categorical)
+    out.concat_categorical = apply_dtypes_and_concatenate(GAME_FILES, out.test_parquet_categorical,
+                                                          out.majority_categorical)
+    return out
@@ -0,0 +1,85 @@
+import json
+import os
+import zipfile
+import pandas as pd
+from click.testing import CliRunner
+from pycricketpred.cli import *
+
+
+def _write_zip(path, n_games):
+    # copy the first n_games members of the sample archive
+    with zipfile.ZipFile('tests/data/test_zips.zip') as src, zipfile.ZipFile(path, 'w') as dst:
+        for info in src.infolist()[:n_games]:
+            dst.writestr(info, src.read(info))
+
+
+def test_run_all_stages(tmp_path, monkeypatch):
+    workdir = str(tmp_path / "pipeline")
+    result = CliRunner().invoke(main, ['run', 'tests/data/test_zips.zip', workdir])
+    assert result.exit_code == 0, result.output
+    for path in pipeline_paths(workdir).values():
+        assert os.path.exists(path)
+    with open(pipeline_paths(workdir)["metrics"]) as f:
+        metrics = json.load(f)
+    assert 0 <= metrics["accuracy"] <= 1
+    assert sum(map(sum, metrics["confusion_matrix"])) == len(pd.read_parquet(pipeline_paths(workdir)["test"]))
+
+    # nothing changed, so every stage is skipped without reading the parquet files again
+    import pycricketpred.data_wrangling as dw
+    def no_read(file_path):
+        raise AssertionError(f"{file_path} was read again")
+    monkeypatch.setattr(dw, "_file_digest", no_read)
+    status = run_pipeline('tests/data/test_zips.zip', workdir)
+    assert set(status.values()) == {"skipped"}
+
+
+def test_run_only_affected_stages(tmp_path):
+    zip_path = str(tmp_path / "games.zip")
+    workdir = str(tmp_path / "pipeline")
+    _write_zip(zip_path, 2)
+    assert run_pipeline(zip_path, workdir, until="concatenate") == {"ingest": "ran", "dtypes": "ran", "concatenate": "ran"}
+    assert len(pd.read_parquet(pipeline_paths(workdir)["main"])['game_id'].unique()) == 2
+
+    # a new game reruns the stages downstream of the archive
+    _write_zip(zip_path, 3)
+    status = run_pipeline(zip_path, workdir)
+    assert status == dict.fromkeys(STAGE_NAMES, "ran")
+    assert len(pd.read_parquet(pipeline_paths(workdir)["main"])['game_id'].unique()) == 3
+
+    # a missing output reruns its stage only, the rebuilt model is identical so evaluation is skipped
+    os.remove(pipeline_paths(workdir)["model"])
+    status = run_pipeline(zip_path, workdir)
+    assert [name for name, value in status.items() if value == "ran"] == ["train"]
+
+    assert set(run_pipeline(zip_path, workdir, force=True).values()) == {"ran"}
+
+
+def test_run_archive_changes(tmp_path):
+    zip_path = str(tmp_path / "games.zip")
+    workdir = str(tmp_path / "pipeline")
+    _write_zip(zip_path, 3)
+    run_pipeline(zip_path, workdir, until="concatenate")
+
+    # a game removed from the archive is removed from the converted games and the combined data
+    _write_zip(zip_path, 2)
+    assert run_pipeline(zip_path, workdir, until="concatenate") == {"ingest": "ran", "dtypes": "ran", "concatenate": "ran"}
+    assert len(pd.read_parquet(pipeline_paths(workdir)["main"])['game_id'].unique()) == 2
+    assert len(os.listdir(pipeline_paths(workdir)["games"])) == 3  # 2 games and the manifest
+
+    # a changed game reruns every stage downstream of the archive
+    with zipfile.ZipFile('tests/data/test_zips.zip') as src, zipfile.ZipFile(zip_path, 'w') as dst:
+        for info in src.infolist()[:2]:
+            game = json.loads(src.read(info))
+            game['innings'][0]['overs'][0]['deliveries'][0]['runs']['batter'] += 1
+            game['innings'][0]['overs'][0]['deliveries'][0]['runs']['total'] += 1
+            dst.writestr(info, json.dumps(game))
+    main_data = pd.read_parquet(pipeline_paths(workdir)["main"])
+    assert run_pipeline(zip_path, workdir, until="concatenate") == {"ingest": "ran", "dtypes": "ran", "concatenate": "ran"}
+    assert pd.read_parquet(pipeline_paths(workdir)["main"])['runs_batter'].sum() == main_data['runs_batter'].sum() + 2
+
+
+def test_run_errors(tmp_path):
+    result = CliRunner().invoke(main, ['run', 'tests/data/no_such.zip', str(tmp_path)])
+    assert result.exit_code != 0
+    result = CliRunner().invoke(main, ['run', 'tests/data/test_zips.zip', str(tmp_path), '--until', 'deploy'])
+    assert result.exit_code != 0
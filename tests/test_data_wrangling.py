@@ -1,54 +1,235 @@
+import io
 import os
 import pandas as pd
 import json  # Make sure to import json
 import pyarrow
+import pyarrow.dataset as ds
+import pyarrow.parquet
 import zipfile
 import pytest
 import sys
 from collections import defaultdict
 from pycricketpred.data_wrangling import *
-import helpers_data_wrangling as hdw
+from concurrent.futures import wait
 
 # test that a dataframe is returned
-def test_parse_cricket_json():
+def test_parse_cricket_json(hdw):
     assert type(hdw.jsontest) == pd.DataFrame, "Dataframe is not returned"
     for col in hdw.cols:
         assert col in hdw.jsontest.columns, f"{col} is not included in the DataFrame"
 
+# check that the columnar parser keeps the column order and per-delivery values
+def test_parse_cricket_json_values(hdw):
+    with open('tests/data/211028.json', 'r') as file:
+        data = json.load(file)
+    deliveries = [d for inning in data['innings'] for over in inning['overs'] for d in over['deliveries']]
+    parsed = hdw.jsontest[DELIVERY_COLUMNS]
+    assert list(parsed.columns) == DELIVERY_COLUMNS
+    assert len(parsed) == len(deliveries)
+    assert parsed['wicket'].sum() == sum(1 for d in deliveries if d.get('wickets'))
+    assert parsed['runs_total'].sum() == sum(d['runs']['total'] for d in deliveries)
+    assert (parsed.loc[parsed['wicket'] == 0, 'wicket_type'] == "").all()
+
+# check that every installed decoder gives the same frame, reading straight from bytes
+def test_json_decoders():
+    with open('tests/data/211028.json', 'rb') as file:
+        raw = file.read()
+    expected = parse_cricket_json(io.BytesIO(raw), '211028', json_decoder="json")
+    for name in ["orjson", "msgspec"]:
+        try:
+            get_json_decoder(name)
+        except ImportError:
+            continue
+        pd.testing.assert_frame_equal(parse_cricket_json(io.BytesIO(raw), '211028', json_decoder=name), expected)
+
+# check that the default decoder is orjson when installed and json otherwise, never msgspec
+def test_default_json_decoder():
+    try:
+        expected = get_json_decoder("orjson")
+    except ImportError:
+        expected = get_json_decoder("json")
+    assert get_json_decoder() is expected
+
+def test_json_decoder_error():
+    with pytest.raises(ValueError):
+        get_json_decoder("yaml")
+
 # check that the parquet files are saved with >0 files
 ## this saving successfully also ensures that the parse_cricket_json runs successfully
-def test_parquet_files_exist():
-    assert os.path.isfile('tests/data/test_parquet/211028.parquet'), "Parquet file not saved"
-    assert os.path.isfile('tests/data/test_parquet/211048.parquet'), "Parquet file not saved"
-    assert os.path.isfile('tests/data/test_parquet/222678.parquet'), "Parquet file not saved"
+def test_parquet_files_exist(hdw):
+    assert os.path.isfile(os.path.join(hdw.test_parquet, '211028.parquet')), "Parquet file not saved"
+    assert os.path.isfile(os.path.join(hdw.test_parquet, '211048.parquet')), "Parquet file not saved"
+    assert os.path.isfile(os.path.join(hdw.test_parquet, '222678.parquet')), "Parquet file not saved"
+
+# check that the process pool writes the same parquet files as the serial path
+def test_parallel_matches_serial(hdw):
+    for game_id in ['211028', '211048', '222678']:
+        serial = pd.read_parquet(os.path.join(hdw.test_parquet, f'{game_id}.parquet'))
+        parallel = pd.read_parquet(os.path.join(hdw.test_parquet_parallel, f'{game_id}.parquet'))
+        pd.testing.assert_frame_equal(serial, parallel)
+
+def test_n_workers_error(tmp_path):
+    with pytest.raises(ValueError):
+        process_cricket_jsons('tests/data/test_zips.zip', str(tmp_path), n_workers=0)
+
+# check that the dataset mode writes every game into season partitions with one schema
+def test_dataset_output(hdw):
+    dataset = ds.dataset(hdw.test_dataset, format="parquet", partitioning="hive")
+    table = dataset.to_table()
+    files = [pd.read_parquet(os.path.join(hdw.test_parquet, f'{game_id}.parquet')) for game_id in ['211028', '211048', '222678']]
+    assert table.num_rows == sum(len(df) for df in files)
+    assert set(table.column('game_id').to_pylist()) == {'211028', '211048', '222678'}
+    seasons = {str(df['season'].iloc[0]) for df in files}
+    assert set(table.column('season').to_pylist()) == seasons
+    assert len(os.listdir(hdw.test_dataset)) == len(seasons)
+    for col in DELIVERY_SCHEMA.names:
+        if col != 'season':
+            assert dataset.schema.field(col).type == DELIVERY_SCHEMA.field(col).type
+
+# check that the worker pool only holds a bounded window of converted shards at a time
+def test_dataset_parallel_bounded(tmp_path, monkeypatch, hdw):
+    import pycricketpred.data_wrangling as dw
+
+    zip_path = tmp_path / "many.zip"
+    with zipfile.ZipFile('tests/data/test_zips.zip') as src, zipfile.ZipFile(zip_path, 'w') as dst:
+        for copy in range(4):
+            for info in src.infolist():
+                dst.writestr(f"{copy}{os.path.basename(info.filename)}", src.read(info))
+
+    in_flight = []
+
+    class TrackingPool(dw.ProcessPoolExecutor):
+        pending = 0
+
+        def submit(self, *args, **kwargs):
+            future = super().submit(*args, **kwargs)
+            TrackingPool.pending += 1
+            in_flight.append(TrackingPool.pending)
+            return future
+
+    def tracking_wait(futures, return_when):
+        done, pending = wait(futures, return_when=return_when)
+        TrackingPool.pending -= len(done)
+        return done, pending
+
+    monkeypatch.setattr(dw, "ProcessPoolExecutor", TrackingPool)
+    monkeypatch.setattr(dw, "wait", tracking_wait)
+    monkeypatch.setattr(dw, "MAX_SHARD_SIZE", 1)
+    process_cricket_jsons(str(zip_path), str(tmp_path / "dataset"), n_workers=2, output_format="dataset")
+
+    assert len(in_flight) == 12
+    assert max(in_flight) <= dw.MAX_PENDING_SHARDS * 2
+    table = ds.dataset(str(tmp_path / "dataset"), format="parquet", partitioning="hive").to_table()
+    assert table.num_rows == 4 * ds.dataset(hdw.test_dataset, format="parquet", partitioning="hive").count_rows()
+
+def test_output_format_error(tmp_path):
+    with pytest.raises(ValueError):
+        process_cricket_jsons('tests/data/test_zips.zip', str(tmp_path), output_format="csv")
+
+# check that an incremental run only converts games that are missing or changed
+def test_incremental_skips_converted(tmp_path):
+    output = str(tmp_path)
+    process_cricket_jsons('tests/data/test_zips.zip', output)
+    with open(os.path.join(output, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    assert sorted(entry['game_id'] for entry in manifest.values()) == ['211028', '211048', '222678']
+
+    mtimes = {f: os.path.getmtime(os.path.join(output, f)) for f in os.listdir(output) if f.endswith('.parquet')}
+    os.remove(os.path.join(output, '211048.parquet'))
+    process_cricket_jsons('tests/data/test_zips.zip', output, incremental=True)
+    assert os.path.isfile(os.path.join(output, '211048.parquet')), "Missing game was not converted again"
+    for f in ['211028.parquet', '222678.parquet']:
+        assert os.path.getmtime(os.path.join(output, f)) == mtimes[f], f"{f} was rewritten"
+
+def test_incremental_parser_version(tmp_path):
+    # games converted before the date column was added have no parser version in the manifest
+    output = str(tmp_path)
+    process_cricket_jsons('tests/data/test_zips.zip', output)
+    with open(os.path.join(output, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    for entry in manifest.values():
+        del entry['version']
+    with open(os.path.join(output, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f)
+    game_path = os.path.join(output, '211028.parquet')
+    pd.read_parquet(game_path).drop(columns=['date']).to_parquet(game_path, index=False)
+
+    process_cricket_jsons('tests/data/test_zips.zip', output, incremental=True)
+    assert 'date' in pyarrow.parquet.read_schema(game_path).names, "Game converted by an older parser was not converted again"
+    with open(os.path.join(output, MANIFEST_NAME)) as f:
+        assert all(entry['version'] == PARSER_VERSION for entry in json.load(f).values())
+
+def test_incremental_removes_deleted_members(tmp_path):
+    output = str(tmp_path / "games")
+    zip_path = str(tmp_path / "games.zip")
+    process_cricket_jsons('tests/data/test_zips.zip', output, incremental=True)
+    with zipfile.ZipFile('tests/data/test_zips.zip') as src, zipfile.ZipFile(zip_path, 'w') as dst:
+        for info in src.infolist():
+            if not info.filename.endswith('211048.json'):
+                dst.writestr(info, src.read(info))
+
+    process_cricket_jsons(zip_path, output, incremental=True)
+    assert sorted(f for f in os.listdir(output) if f.endswith('.parquet')) == ['211028.parquet', '222678.parquet']
+    with open(os.path.join(output, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    assert sorted(entry['game_id'] for entry in manifest.values()) == ['211028', '222678']
+
+def test_incremental_dataset_error(tmp_path):
+    with pytest.raises(ValueError):
+        process_cricket_jsons('tests/data/test_zips.zip', str(tmp_path), output_format="dataset", incremental=True)
 
 # a zipped folder with no json files creates an empty folder
-def test_empty_zipped_folder():
-     assert os.path.isdir('tests/data/test_parquet_empty'), "Does not create empty parquet folder"
+def test_empty_zipped_folder(hdw):
+     assert os.path.isdir(hdw.test_parquet_empty), "Does not create empty parquet folder"
 
 # check that the correct columns are added for the add_columns function
-def test_check_columns_added():
+def test_check_columns_added(hdw):
     assert 'team_over' in hdw.data1.columns, "Team over not in dataframe"
     assert 'over_ball' in hdw.data1.columns, "Over_ball not in dataframe"
     assert 'inning' in hdw.data1.columns, "Inning not in dataframe"
     assert 'runs_cumulative' in hdw.data1.columns, "Runs_cumulative not in dataframe"
     assert 'powerplay' in hdw.data1.columns, "Powerplay not in dataframe"
 
-def test_key_val_error():
+# check the values of the added columns
+def test_added_column_values(hdw):
+    assert list(hdw.data1['inning']) == [1, 2, 1]
+    assert list(hdw.data1['over_ball']) == [1, 1, 1]
+    assert list(hdw.data1['runs_cumulative']) == [100, 52, 131]
+    assert list(hdw.data1['powerplay']) == [1, 1, 1]
+
+# check that one call over several games matches calling add_columns game by game
+def test_add_columns_by_game(hdw):
+    games = [pd.read_parquet(os.path.join(hdw.test_parquet, f'{game_id}.parquet')) for game_id in ['211028', '211048', '222678']]
+    combined = pd.concat(games, ignore_index=True)
+    added = ['team_over', 'over_ball', 'inning', 'runs_cumulative', 'powerplay']
+    result = add_columns(combined.drop(columns=added), by_game=True)
+    pd.testing.assert_frame_equal(result[combined.columns], combined)
+
+def test_key_val_error(hdw):
     with pytest.raises(KeyError):
         add_columns(hdw.data_missing_cols)
 
 # test majority dtypes returns the right objects
-def test_majority_dtypes():
+def test_majority_dtypes(hdw):
     assert type(hdw.majority1) == dict, "Did not return a dictionary"
     assert type(hdw.majority2) == dict, "Did not return a dictionary"
 
 # check majority dtypes returns correct values
-def test_majority_output():
+def test_majority_output(hdw):
     assert len(hdw.majority1) == hdw.jsontest.shape[1]
 
+# check that voting on the footer schemas gives the same mapping as reading the files
+def test_majority_metadata_only(hdw):
+    assert hdw.majority3 == hdw.majority1
+
+# the integer season of game 211028 disagrees with the '2005/06' style seasons of the others
+def test_dtype_disagreements(hdw):
+    disagreements = dtype_disagreements(['211028.parquet', '211048.parquet', '222678.parquet'],
+                                        hdw.test_parquet, hdw.majority1)
+    assert disagreements == {'211028.parquet': {'season': 'int64'}}
+
 # check that concatenated dataframe function returns dataframe with right columns
-def test_concat_output():
+def test_concat_output(hdw):
     assert type(hdw.concat1) == pd.DataFrame, "Does not return a dataframe"
     assert type(hdw.concat2) == pd.DataFrame, "Does not return a dataframe"
     for col in hdw.concat1.columns:
@@ -57,6 +238,68 @@ def test_concat_output():
         else:
             assert hdw.concat1[col].dtype == hdw.majority1[col], f"Wrong dtype for column {col}"
 
+# check that the streamed output matches the in-memory concatenation
+def test_streamed_output(hdw):
+    assert hdw.streamed_rows == len(hdw.concat1)
+    pd.testing.assert_frame_equal(pd.read_parquet(os.path.join(hdw.test_streamed, 'cricket_main.parquet')), hdw.concat1)
+    assert pyarrow.parquet.ParquetFile(os.path.join(hdw.test_streamed, 'cricket_main.parquet')).metadata.num_row_groups == 2
+
+# check that record batches are bounded in size and share the mapped schema
+def test_iter_dtype_batches(hdw):
+    assert all(batch.num_rows <= 100 for batch in hdw.batches)
+    assert sum(batch.num_rows for batch in hdw.batches) == len(hdw.concat1)
+    assert all(batch.schema == dtype_mapping_schema(hdw.majority1) for batch in hdw.batches)
+
+# check that categorical columns survive parsing, parquet round trips and concatenation
+def test_categorical_pipeline(hdw):
+    for col in CATEGORICAL_COLUMNS:
+        assert isinstance(hdw.concat_categorical[col].dtype, pd.CategoricalDtype), f"{col} is not categorical"
+    expected = hdw.concat1.astype({col: 'category' for col in CATEGORICAL_COLUMNS})
+    pd.testing.assert_frame_equal(hdw.concat_categorical, expected, check_categorical=False)
+
+# check that files with plain string columns can be concatenated into categoricals
+def test_concat_categorical_option(hdw):
+    concat = apply_dtypes_and_concatenate(['211028.parquet', '211048.parquet', '222678.parquet'],
+                                          hdw.test_parquet, hdw.majority1, categorical=True)
+    assert set(concat['season'].cat.categories) == set(hdw.concat1['season'])
+    assert isinstance(concat['batter_id'].dtype, pd.CategoricalDtype)
+
+# check that the player registry is persisted and its keys map deliveries back to their players
+def test_player_registry(tmp_path):
+    output = str(tmp_path)
+    process_cricket_jsons('tests/data/test_zips.zip', output, player_registry=True)
+    registry = read_player_registry(output)
+    assert list(registry['player_key']) == list(range(len(registry)))
+    assert registry['player_id'].is_unique
+
+    # the converted deliveries carry the registry keys
+    game = pd.read_parquet(os.path.join(output, '211028.parquet'))
+    assert game['batter_key'].dtype == 'int32'
+    assert (registry['player_id'].to_numpy()[game['batter_key']] == game['batter_id']).all()
+    assert (game.loc[game['player_out_id'] == "", 'player_out_key'] == -1).all()
+    pd.testing.assert_frame_equal(encode_player_keys(game.drop(columns=['batter_key']), registry), game,
+                                  check_like=True)
+
+    # rerunning keeps existing keys and adds only unseen players
+    updated = update_player_registry(registry, pd.DataFrame({'player_id': ['zzzzzzzz', registry['player_id'][0]],
+                                                             'name': ['New Player', 'Renamed']}))
+    pd.testing.assert_frame_equal(updated.iloc[:len(registry)], registry)
+    assert list(updated['player_id'][len(registry):]) == ['zzzzzzzz']
+
+# check that the registry doesn't depend on the workers, and that every output mode stores the keys
+def test_player_registry_modes(tmp_path):
+    serial = str(tmp_path / "serial")
+    process_cricket_jsons('tests/data/test_zips.zip', serial, player_registry=True)
+    for name, options in [("parallel", dict(n_workers=2)), ("categorical", dict(categorical=True)),
+                          ("dataset", dict(output_format="dataset", n_workers=2))]:
+        output = str(tmp_path / name)
+        process_cricket_jsons('tests/data/test_zips.zip', output, player_registry=True, **options)
+        pd.testing.assert_frame_equal(read_player_registry(output), read_player_registry(serial))
+        data = pd.concat([pd.read_parquet(path, columns=['batter_key', 'bowler_key'])
+                          for path in parquet_data_files(output)])
+        assert (data['bowler_key'] >= 0).all()
+        assert data['batter_key'].dtype == 'int32'
+
 # ## check that exceptions are raised
 # # check that an exception is raised when the parquet file is not processed
 # def test_parquet_exception():
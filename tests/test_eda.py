@@ -13,7 +13,7 @@ def test_vis_bar_output():
     assert isinstance(hp_eda.result1, alt.Chart), "Output is not an Altair Chart"
     assert hp_eda.result1.encoding.x.shorthand == hp_eda.x_input1, "X-axis is not x-axis input"
     assert hp_eda.result3.encoding.x.shorthand + ":N" == hp_eda.x_input4, "X-axis is not x-axis input"
-    assert hp_eda.result1.encoding.y.shorthand == 'count()', "X-axis is not x-axis input"
+    assert hp_eda.result1.encoding.y.shorthand == 'count:Q', "Y-axis is not the aggregated count"
     assert hp_eda.result1.width == hp_eda.width1, "Width is not width specified"
     assert hp_eda.result1.height == hp_eda.height1, "Height is not height specified"
 
@@ -67,3 +67,76 @@ def test_value_error():
         vis_bar(hp_eda.data4, hp_eda.x_input1, hp_eda.width1, hp_eda.height1)
 
 
+
+# test that charts are built from aggregated rows
+def test_vis_bar_aggregated():
+    data = pd.DataFrame({'over': [0, 1, 1, 2, 2, 2] * 1000, 'wicket': [0, 1, 0, 0, 0, 1] * 1000})
+    chart = vis_bar(data, 'over', 10, 20)
+    assert chart.data['over'].tolist() == [0, 1, 2]
+    assert chart.data['count'].tolist() == [1000, 2000, 3000]
+    nominal = vis_bar(data, 'over:N', 10, 20)
+    assert nominal.data['over'].tolist() == ['0', '1', '2']
+
+# test that parquet and dataframe aggregates agree and are cached per column
+def test_column_aggregates(tmp_path):
+    data = pd.DataFrame({'over': [3, 1, 1, 2, 2, 2], 'team': list('ababab'), 'wicket': [0, 1, 0, 0, 1, 1]})
+    data.to_parquet(tmp_path / "deliveries.parquet")
+    from_frame = ColumnAggregates(data)
+    from_parquet = ColumnAggregates(str(tmp_path / "deliveries.parquet"))
+    for col in ['over', 'team', 'wicket']:
+        pd.testing.assert_frame_equal(from_frame[col], from_parquet[col], check_dtype=False)
+    assert from_frame['over']['wickets'].tolist() == [1, 2, 0]
+    assert from_frame['over'] is from_frame['over']
+    assert sorted(from_parquet.columns) == ['over', 'team', 'wicket'] and not from_parquet.empty
+    with pytest.raises(KeyError):
+        from_parquet['season']
+    with pytest.raises(TypeError):
+        ColumnAggregates(10)
+
+# test that a folder of dictionary-encoded files aggregates like the plain one
+def test_column_aggregates_categorical(hdw):
+    categorical = ColumnAggregates(hdw.test_parquet_categorical)
+    plain = ColumnAggregates(hdw.test_parquet)
+    for col in ['team', 'batter_id', 'over']:
+        pd.testing.assert_frame_equal(categorical[col], plain[col], check_dtype=False)
+    assert categorical['team']['count'].sum() == len(hdw.concat_categorical)
+
+# test that charting neither modifies nor copies the input frame
+def test_input_untouched(tmp_path):
+    data = pd.DataFrame({'A': np.arange(6) % 3, 'B': pd.Categorical(list('xyxyxy')), 'wicket': [0, 1, 0, 0, 1, 1]})
+    expected = data.copy(deep=True)
+    values = data['A'].to_numpy()
+    vis_bar(data, 'A:N', 10, 20)
+    vis_bar(data, 'B', 10, 20)
+    hist_chart(data, 'A', 'untouched.png', str(tmp_path))
+    pd.testing.assert_frame_equal(data, expected)
+    assert np.shares_memory(data['A'].to_numpy(), values)
+    assert data.attrs == {}
+
+# test that invalid inputs don't create the output folder
+def test_hist_invalid_no_folder(tmp_path):
+    with pytest.raises(KeyError):
+        hist_chart(hp_eda.data3, hp_eda.x_input1, hp_eda.chart1, str(tmp_path / "charts"))
+    assert not os.path.exists(tmp_path / "charts")
+
+# test batch rendering of the wicket charts, in this process and in workers
+def test_hist_charts(tmp_path):
+    data = pd.DataFrame({'A': np.arange(60) % 3, 'B': np.arange(60) % 5, 'C': np.arange(60) % 2,
+                         'wicket': np.arange(60) % 7 == 0})
+    figures = plt.get_fignums()
+    report = hist_charts(data, ['A', 'B', 'C'], str(tmp_path / "serial"))
+    assert report['column'].tolist() == ['A', 'B', 'C']
+    assert (report['render_seconds'] > 0).all()
+    assert plt.get_fignums() == figures, "Charts must not leave pyplot figures open"
+
+    parallel = hist_charts(ColumnAggregates(data), ['A', 'B', 'C'], str(tmp_path / "parallel"), n_workers=2)
+    for serial_path, parallel_path in zip(report['path'], parallel['path']):
+        with open(serial_path, 'rb') as f1, open(parallel_path, 'rb') as f2:
+            assert f1.read() == f2.read(), "Charts must not depend on the charts drawn before them"
+
+    with pytest.raises(KeyError):
+        hist_charts(data, ['A', 'F'], str(tmp_path))
+    with pytest.raises(TypeError):
+        hist_charts(data, 'A', str(tmp_path))
+    with pytest.raises(ValueError):
+        hist_charts(data, ['A'], str(tmp_path), n_workers=0)
@@ -0,0 +1,13 @@
+import subprocess
+import sys
+import pytest
+
+HEAVY = ["sklearn", "scipy", "matplotlib", "altair"]
+
+
+@pytest.mark.parametrize("module", ["data_wrangling", "data_cleaning", "eda", "modelling", "scoring", "player_stats"])
+def test_import_is_lazy(module):
+    # importing a module must not pull in the plotting or modelling libraries
+    script = f"import sys, pycricketpred.{module}; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    loaded = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout.strip()
+    assert loaded == ""
@@ -1,18 +1,22 @@
+import os
+import numpy as np
 import pandas as pd
+import pytest
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 import sklearn.metrics as metrics
+from sklearn.model_selection import train_test_split
 from pycricketpred.modelling import * 
 
-def test_split_train():
+def test_split_train(cricket_main):
     """
     Conduct assertion tests on the functionality of the split_train_test function.
     """
-    data = pd.read_parquet('tests/data/cricket_main.parquet')
+    data = pd.read_parquet(cricket_main)
     X = data.drop(columns = ['wicket'])
     y = data['wicket']
     X_train, X_test, y_train, y_test = train_test_split(X, y, train_size=0.7, random_state=123)
 
-    X_train_output, X_test_output, y_train_output, y_test_output = split_train_test('tests/data/cricket_main.parquet')
+    X_train_output, X_test_output, y_train_output, y_test_output = split_train_test(cricket_main)
 
     #The length of the training set should match the length of the output from the train_test_split() function.
     assert(len(X_train) == len(X_train_output))
@@ -64,28 +68,28 @@ def test_transformer():
     assert(ct.transformers[2][0] == "drop")
 
 
-def test_build_final_mode():
+def test_build_final_mode(cricket_main):
     """
     Conduct assertion tests on the functionality of the build_final_model function.
     """
     ohe, scaler = preprocessing()
     ct = transformer(ohe, scaler)
-    X_train, X_test, y_train, y_test = split_train_test('tests/data/cricket_main.parquet')
+    X_train, X_test, y_train, y_test = split_train_test(cricket_main)
     final_pipe = build_final_model(ct, X_train, y_train)
 
     #The pipeline consists of two layers: the transformer named "columntransformer" and the model named "logisticregression".
     assert(list(final_pipe.named_steps.keys())[0] == "columntransformer")
     assert(list(final_pipe.named_steps.keys())[1] == "logisticregression")
 
-def test_evaluate_model():
+def test_evaluate_model(cricket_main, tmp_path):
     """
     Conduct assertion tests on the functionality of the evaluate_model function.
     """
     ohe, scaler = preprocessing()
     ct = transformer(ohe, scaler)
-    X_train, X_test, y_train, y_test = split_train_test('tests/data/cricket_main.parquet')
+    X_train, X_test, y_train, y_test = split_train_test(cricket_main)
     final_pipe = build_final_model(ct, X_train, y_train)
-    score, conf_mat, plot_cm = evaluate_model(final_pipe, X_test, y_test, "tests/images/")
+    score, conf_mat, plot_cm = evaluate_model(final_pipe, X_test, y_test, str(tmp_path))
 
     #The test score should be exactly the same as before. The values produced by confusion_matrix() should match those obtained previously. 
     #Additionally, plot_cm should be an instance of ConfusionMatrixDisplay().
@@ -113,3 +117,172 @@ def test_evaluate_model():
 
 
 
+
+
+def test_split_train_projected(cricket_main):
+    """
+    Conduct assertion tests on reading only the model columns, with and without a pushed down filter.
+    """
+    X_train, X_test, y_train, y_test = split_train_test(cricket_main)
+    X_train_proj, X_test_proj, y_train_proj, y_test_proj = split_train_test(cricket_main,
+                                                                            columns=MODEL_FEATS)
+
+    #Only the model columns are read, and the split is the same as with all the columns.
+    assert(list(X_train_proj.columns) == MODEL_FEATS)
+    assert((X_train_proj.index == X_train.index).all())
+    assert((X_train_proj == X_train[MODEL_FEATS]).all().all())
+    assert((y_test_proj == y_test).all())
+
+    #A projected training set can be fit with a transformer that drops nothing.
+    ohe, scaler = preprocessing()
+    final_pipe = build_final_model(transformer(ohe, scaler, drop_feats=[]), X_train_proj, y_train_proj)
+    assert(final_pipe.score(X_test_proj, y_test_proj) == build_final_model(transformer(ohe, scaler), X_train, y_train).score(X_test, y_test))
+
+    #The filter only keeps the rows of the requested seasons.
+    data = read_model_data(cricket_main, columns=['season', 'wicket'], filters={'season': ['2005']})
+    assert(len(data) == (pd.read_parquet(cricket_main)['season'] == '2005').sum())
+    assert(set(data['season']) == {'2005'})
+
+
+def test_build_streaming_model(cricket_main):
+    """
+    Conduct assertion tests on the functionality of the build_streaming_model function.
+    """
+    data = pd.read_parquet(cricket_main)
+    final_pipe = build_streaming_model(cricket_main, batch_size=100, n_epochs=2)
+
+    #The pipeline consists of the transformer named "columntransformer" and the model named "sgdclassifier".
+    assert(list(final_pipe.named_steps.keys()) == ["columntransformer", "sgdclassifier"])
+
+    #The scaler statistics streamed over the batches match the full data.
+    scaler = final_pipe.named_steps["columntransformer"].named_transformers_["standardscaler"]
+    assert(np.allclose(scaler.mean_, data[NUMERICAL_FEATS].mean()))
+    assert(np.allclose(scaler.scale_, data[NUMERICAL_FEATS].std(ddof=0)))
+
+    #The classes are weighted like class_weight="balanced".
+    class_weight = final_pipe.named_steps["sgdclassifier"].class_weight
+    balanced = len(data) / (2 * data['wicket'].value_counts())
+    assert(np.isclose(class_weight[0], balanced[0]) and np.isclose(class_weight[1], balanced[1]))
+
+    proba = final_pipe.predict_proba(data[MODEL_FEATS])
+    assert(proba.shape == (len(data), 2))
+
+
+def test_encode_features_cache(cricket_main, tmp_path):
+    """
+    Conduct assertion tests on the encoded feature cache.
+    """
+    cache_dir = str(tmp_path)
+    X_train, X_test, y_train, y_test = split_train_test(cricket_main)
+    ohe, scaler = preprocessing()
+    fitted_ct, X_encoded = encode_features(transformer(ohe, scaler), X_train, cache_dir)
+    assert(len(os.listdir(cache_dir)) == 1)
+
+    #A second call with the same data and configuration is read from the cache.
+    ohe, scaler = preprocessing()
+    cached_ct, cached_encoded = encode_features(transformer(ohe, scaler), X_train, cache_dir)
+    assert(len(os.listdir(cache_dir)) == 1)
+    assert((abs(cached_encoded - X_encoded)).max() == 0)
+
+    #Cached pipelines give the same model as fitting the whole pipeline.
+    ohe, scaler = preprocessing()
+    final_pipe = build_final_model(transformer(ohe, scaler), X_train, y_train, cache_dir=cache_dir)
+    ohe, scaler = preprocessing()
+    expected = build_final_model(transformer(ohe, scaler), X_train, y_train)
+    assert(np.allclose(final_pipe.predict_proba(X_test), expected.predict_proba(X_test)))
+
+    #Entries beyond the size limit are evicted, oldest first.
+    encode_features(cached_ct, X_test, cache_dir, fit=False, max_cache_bytes=0)
+    assert(len(os.listdir(cache_dir)) == 0)
+
+
+def test_tune_model(cricket_main):
+    """
+    Conduct assertion tests on the functionality of the tune_model function.
+    """
+    X_train, X_test, y_train, y_test = split_train_test(cricket_main)
+    param_grid = {'C': [0.1, 1.0], 'penalty': ['l1', 'l2']}
+    results, best_params = tune_model(X_train, y_train, param_grid=param_grid, n_splits=3, n_workers=2)
+
+    #Every candidate is reported with its score and timings, best first.
+    assert(len(results) == 4)
+    for col in ['param_C', 'param_penalty', 'mean_score', 'std_score', 'mean_fit_time', 'total_time']:
+        assert(col in results.columns)
+    assert(results['mean_score'].is_monotonic_decreasing)
+    assert(best_params == {'C': results['param_C'][0], 'penalty': results['param_penalty'][0]})
+
+    #The process pool gives the same scores as evaluating the candidates serially.
+    serial_results, _ = tune_model(X_train, y_train, param_grid=param_grid, n_splits=3)
+    assert(np.allclose(serial_results['mean_score'], results['mean_score']))
+
+
+def test_evaluate_predictions(cricket_main):
+    """
+    Conduct assertion tests on the metrics derived from a single inference pass.
+    """
+    X_train, X_test, y_train, y_test = split_train_test(cricket_main)
+    ohe, scaler = preprocessing()
+    final_pipe = build_final_model(transformer(ohe, scaler), X_train, y_train)
+    results = evaluate_predictions(final_pipe, X_test, y_test)
+    proba = final_pipe.predict_proba(X_test)
+
+    assert(np.isclose(results["accuracy"], final_pipe.score(X_test, y_test)))
+    assert(np.isclose(results["roc_auc"], metrics.roc_auc_score(y_test, proba[:, 1])))
+    assert(np.isclose(results["log_loss"], metrics.log_loss(y_test, proba)))
+    assert(results["calibration"]["count"].sum() == len(X_test))
+    assert(results["per_over"]["count"].sum() == len(X_test))
+    assert(set(results["per_season"].index) == set(X_test["season"]))
+
+    #Rows with missing values are dropped together with their targets.
+    X_missing = X_test.copy()
+    X_missing.iloc[0, X_missing.columns.get_loc("team")] = None
+    results_missing = evaluate_predictions(final_pipe, X_missing, y_test)
+    assert(results_missing["confusion_matrix"].sum() == len(X_test) - 1)
+
+    #Headless evaluation skips the plot.
+    score, conf_mat, plot_cm = evaluate_model(final_pipe, X_test, y_test, plot=False)
+    assert(plot_cm is None)
+    assert((conf_mat == results["confusion_matrix"]).all())
+
+
+def test_add_match_state():
+    """
+    Conduct assertion tests on the match-state columns of the add_match_state function.
+    """
+    # one inning of game 1 (a wide, a wicket, a no-ball) and the start of game 2
+    df = pd.DataFrame({
+        'game_id': ['1'] * 6 + ['2'] * 2,
+        'inning': [1] * 6 + [1] * 2,
+        'batter': ['a', 'a', 'a', 'b', 'b', 'b', 'c', 'c'],
+        'wicket': [0, 0, 1, 0, 0, 0, 0, 0],
+        'runs_batter': [4, 0, 0, 1, 0, 2, 6, 0],
+        'runs_total': [4, 1, 0, 1, 1, 2, 6, 0],
+        'wides': [0, 1, 0, 0, 0, 0, 0, 0],
+        'noballs': [0, 0, 0, 0, 1, 0, 0, 0],
+    })
+    out = add_match_state(df)
+
+    #Every column only counts the earlier deliveries of the same inning.
+    assert out['wickets_fallen'].tolist() == [0, 0, 0, 1, 1, 1, 0, 0]
+    assert out['balls_since_wicket'].tolist() == [0, 1, 1, 0, 1, 1, 0, 1]
+    assert out['batter_balls'].tolist() == [0, 1, 1, 0, 1, 2, 0, 1]
+    assert out['batter_runs'].tolist() == [0, 4, 4, 0, 1, 1, 0, 6]
+    assert np.allclose(out['run_rate'], [0, 24, 30, 15, 12, 14, 0, 36])
+
+    with pytest.raises(KeyError):
+        add_match_state(df.drop(columns=['wides']))
+
+
+def test_transformer_match_state(cricket_main):
+    """
+    Conduct assertion tests on a model trained with the match-state columns.
+    """
+    data = add_match_state(pd.read_parquet(cricket_main))
+    X_train, X_test, y_train, y_test = train_test_split(data.drop(columns=['wicket']), data['wicket'],
+                                                        train_size=0.7, random_state=123)
+    ohe, scaler = preprocessing()
+    ct = transformer(ohe, scaler, match_state=True)
+    assert ct.transformers[0][2] == NUMERICAL_FEATS + MATCH_STATE_FEATS
+
+    final_pipe = build_final_model(ct, X_train, y_train)
+    assert final_pipe.predict_proba(X_test).shape == (len(X_test), 2)
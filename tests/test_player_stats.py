@@ -0,0 +1,71 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+from pycricketpred.player_stats import *
+
+
+def test_game_player_stats(games_folder):
+    deliveries = pd.read_parquet(os.path.join(games_folder, '211028.parquet'))
+    stats = game_player_stats(deliveries).set_index('player_id')
+    # every run off the bat and every legal ball is credited to exactly one batter and bowler
+    assert stats['bat_runs'].sum() == deliveries['runs_batter'].sum()
+    assert stats['bowl_balls'].sum() == ((deliveries['wides'] == 0) & (deliveries['noballs'] == 0)).sum()
+    assert stats['dismissals'].sum() == (deliveries['wicket'] == 1).sum() - deliveries['wicket_type'].isin(RETIRED_WICKETS).sum()
+    assert (stats['date'] == pd.Timestamp('2005-06-13')).all()
+    with pytest.raises(KeyError):
+        game_player_stats(deliveries.drop(columns=['date']))
+
+
+def test_wicket_kinds(games_folder):
+    # one wicket of every kind, each taking a different batter, all off the same bowler
+    kinds = ['bowled', 'caught', 'caught and bowled', 'lbw', 'stumped', 'hit wicket'] + NON_BOWLER_WICKETS
+    deliveries = pd.read_parquet(os.path.join(games_folder, '211028.parquet'), columns=DELIVERY_STATS_COLUMNS)
+    deliveries = deliveries.iloc[[0] * len(kinds)].reset_index(drop=True)
+    deliveries['batter_id'] = deliveries['player_out_id'] = [f"batter{i}" for i in range(len(kinds))]
+    deliveries['wicket'] = 1
+    deliveries['wicket_type'] = kinds
+    stats = game_player_stats(deliveries).set_index('player_id')
+
+    assert stats.loc[deliveries['bowler_id'].iloc[0], 'bowl_wickets'] == 6
+    out = [f"batter{i}" for i, kind in enumerate(kinds) if kind not in RETIRED_WICKETS]
+    assert stats['dismissals'].sum() == len(kinds) - 2
+    assert (stats.loc[out, 'dismissals'] == 1).all()
+
+
+def test_update_matches_build(games_folder, tmp_path):
+    # the store grows game by game, including a game dated before the stored ones
+    folder = tmp_path / "games"
+    folder.mkdir()
+    store_path = str(tmp_path / "career_stats.parquet")
+    for game in ['211028', '222678', '211048']:
+        shutil.copy(os.path.join(games_folder, f"{game}.parquet"), folder)
+        update_career_stats(store_path, str(folder))
+    store = read_career_stats(store_path)
+    pd.testing.assert_frame_equal(store, build_career_stats(games_folder), check_dtype=False)
+    assert update_career_stats(store_path, str(folder)).equals(store)
+
+
+def test_join_career_stats(games_folder, cricket_main):
+    store = build_career_stats(games_folder)
+    deliveries = pd.read_parquet(cricket_main)
+    joined = join_career_stats(deliveries.copy(), store)
+
+    # brute force: sum the player's games dated before the delivery's game
+    dates = pd.to_datetime(deliveries['date'])
+    rows = np.random.default_rng(0).choice(len(deliveries), 50, replace=False)
+    for row in rows:
+        earlier = store[store['date'] < dates.iloc[row]]
+        batter = earlier[earlier['player_id'] == deliveries['batter_id'].iloc[row]]
+        bowler = earlier[earlier['player_id'] == deliveries['bowler_id'].iloc[row]]
+        assert joined['batter_career_runs'].iloc[row] == batter['bat_runs'].sum()
+        assert joined['batter_career_dismissals'].iloc[row] == batter['dismissals'].sum()
+        assert joined['bowler_career_wickets'].iloc[row] == bowler['bowl_wickets'].sum()
+        assert joined['bowler_career_games'].iloc[row] == len(bowler)
+
+    # nothing is known before the first game
+    first = dates == dates.min()
+    assert (joined.loc[first, BATTER_CAREER_FEATS[:-1] + BOWLER_CAREER_FEATS[:-1]] == 0).all().all()
+    assert joined.loc[first, 'bowler_strike_rate'].isna().all()
+    assert list(joined.index) == list(deliveries.index)
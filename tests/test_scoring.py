@@ -0,0 +1,139 @@
+import os
+import shutil
+import numpy as np
+import pandas as pd
+import pytest
+from pycricketpred.modelling import *
+from pycricketpred.scoring import *
+from pycricketpred.data_wrangling import data_fingerprint
+
+
+@pytest.fixture(scope="module")
+def model(cricket_main):
+    """ The test split of the sample data and a pipeline trained on its train split """
+    X_train, X_test, y_train, y_test = split_train_test(cricket_main)
+    ohe, scaler = preprocessing()
+    return build_final_model(transformer(ohe, scaler), X_train, y_train), X_test
+
+
+def test_compiled_predictor_matches_pipeline(model):
+    """
+    The compiled predictor should match predict_proba for DataFrames, NumPy rows and single dicts.
+    """
+    final_pipe, X_test = model
+    predictor = compile_predictor(final_pipe)
+    expected = final_pipe.predict_proba(X_test)
+
+    assert(predictor.features == MODEL_FEATS)
+    assert(np.allclose(predictor.predict_proba(X_test), expected))
+    assert(np.allclose(predictor.predict_proba(X_test[predictor.features].to_numpy()), expected))
+    row = X_test[MODEL_FEATS].iloc[0].to_dict()
+    assert(np.isclose(predictor.predict_one(row), expected[0, 1]))
+    assert(np.allclose(predictor.predict_proba(row), expected[:1]))
+
+
+def test_compiled_predictor_unknown_category(model):
+    """
+    Unknown categories contribute nothing, like handle_unknown="ignore".
+    """
+    final_pipe, X_test = model
+    predictor = compile_predictor(final_pipe)
+    row = X_test[MODEL_FEATS].iloc[[0]].copy()
+    row['over'] = 99
+    assert(np.allclose(predictor.predict_proba(row), final_pipe.predict_proba(row)))
+
+
+def test_compiled_predictor_streaming_model(model, cricket_main):
+    """
+    Pipelines from build_streaming_model compile too.
+    """
+    final_pipe, X_test = model
+    streaming_pipe = build_streaming_model(cricket_main, n_epochs=1)
+    predictor = compile_predictor(streaming_pipe)
+    assert(np.allclose(predictor.predict_proba(X_test), streaming_pipe.predict_proba(X_test[MODEL_FEATS])))
+
+
+def test_compiled_predictor_row_error(model):
+    final_pipe, _ = model
+    predictor = compile_predictor(final_pipe)
+    with pytest.raises(ValueError):
+        predictor.predict_proba(np.zeros((2, 3)))
+
+
+def test_save_load_model(model, cricket_main, tmp_path):
+    """
+    A saved model loads back into a predictor with the same probabilities and its metadata.
+    """
+    final_pipe, X_test = model
+    path = str(tmp_path / "wicket.npz")
+    metadata = save_model(final_pipe, path, training_data=cricket_main)
+    predictor = load_model(path)
+
+    assert(np.allclose(predictor.predict_proba(X_test), final_pipe.predict_proba(X_test)))
+    assert(predictor.metadata == metadata)
+    assert(metadata["numerical_feats"] + metadata["categorical_feats"] == MODEL_FEATS)
+    assert(metadata["model"] == "LogisticRegression")
+    assert(metadata["training_data_fingerprint"] == data_fingerprint(cricket_main))
+
+
+def test_data_fingerprint(cricket_main, games_folder):
+    """
+    The fingerprint is stable and depends on the data.
+    """
+    assert(data_fingerprint(cricket_main) == data_fingerprint(cricket_main))
+    assert(data_fingerprint(cricket_main) != data_fingerprint(games_folder))
+
+
+def test_data_fingerprint_cache(games_folder, tmp_path):
+    """
+    Cached digests are reused for files whose size and modification time are unchanged.
+    """
+    folder = tmp_path / "games"
+    shutil.copytree(games_folder, folder)
+    cache = {}
+    fingerprint = data_fingerprint(str(folder), cache)
+    assert(fingerprint == data_fingerprint(str(folder)))
+    assert(sorted(os.path.basename(f) for f in cache) == ['211028.parquet', '211048.parquet', '222678.parquet'])
+
+    # a stale digest of an unchanged file is trusted, so the file was not read again
+    game_path = str(folder / "211028.parquet")
+    digest = cache[game_path][2]
+    cache[game_path][2] = "0" * 64
+    assert(data_fingerprint(str(folder), cache) != fingerprint)
+
+    # a rewritten file is read again
+    pd.read_parquet(game_path).iloc[1:].to_parquet(game_path, index=False)
+    assert(data_fingerprint(str(folder), cache) == data_fingerprint(str(folder)) != fingerprint)
+    assert(cache[game_path][2] != digest)
+
+
+def test_data_fingerprint_value_change(cricket_main, tmp_path):
+    """
+    Changing a single value changes the fingerprint, even when the schema, row counts and statistics do not.
+    """
+    data = pd.read_parquet(cricket_main)
+    row = data.index[(data['runs_batter'] == 1).to_numpy()][0]
+    data.to_parquet(str(tmp_path / "before.parquet"), index=False)
+    data.loc[row, 'runs_batter'] = 2
+    data.to_parquet(str(tmp_path / "after.parquet"), index=False)
+    assert(data_fingerprint(str(tmp_path / "before.parquet")) != data_fingerprint(str(tmp_path / "after.parquet")))
+
+
+def test_score_archive(model, cricket_main, games_folder, tmp_path):
+    """
+    Batch scoring writes one probability per delivery, matching the pipeline, with and without workers.
+    """
+    final_pipe, X_test = model
+    n_rows = score_archive(final_pipe, cricket_main, str(tmp_path / "single"), batch_size=100)
+    predictions = pd.read_parquet(str(tmp_path / "single" / "cricket_main.parquet"))
+    data = pd.read_parquet(cricket_main)
+
+    assert(n_rows == len(data))
+    assert(list(predictions.columns) == ['game_id', 'inning', 'over', 'over_ball', 'wicket_probability'])
+    assert(np.allclose(predictions['wicket_probability'], final_pipe.predict_proba(data)[:, 1]))
+
+    path = str(tmp_path / "wicket.npz")
+    save_model(final_pipe, path)
+    n_rows = score_archive(path, games_folder, str(tmp_path / "games"), n_workers=2)
+    assert(n_rows == len(data))
+    assert(sorted(os.listdir(str(tmp_path / "games"))) == ['211028.parquet', '211048.parquet', '222678.parquet'])